@@ -25,6 +25,9 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', secrets.token_hex(32))
 print(f"DEBUG: Using SECRET_KEY (first 16 chars): {app.config['SECRET_KEY'][:16]}...")
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///music_sync.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+    # Sync jobs write from background threads, wait for the lock rather than failing
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
 app.config['UPLOAD_FOLDER'] = 'user_data'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 app.config['SPOTIFY_CLIENT_ID'] = os.environ.get('SPOTIFY_CLIENT_ID', '329e873b7a9f45a4a8128770e084e27c')
@@ -123,11 +126,64 @@ class SyncHistory(db.Model):
     completed_at = db.Column(db.DateTime)
 
 
+class SyncJob(db.Model):
+    """A sync queued for, or running on, the background job workers"""
+    __tablename__ = 'sync_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    kind = db.Column(db.String(50), nullable=False)
+    params_json = db.Column(db.Text)
+    status = db.Column(db.String(20), default='queued')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime, default=datetime.utcnow)
+    progress_json = db.Column(db.Text)
+    result_json = db.Column(db.Text)
+    
+    def get_params(self):
+        if self.params_json:
+            return json.loads(self.params_json)
+        return {}
+    
+    def set_params(self, params_dict):
+        self.params_json = json.dumps(params_dict)
+    
+    def is_finished(self):
+        return self.status in ('completed', 'failed')
+    
+    def result_sse(self):
+        """The job's final ('complete' or 'error') event in text/event-stream format"""
+        result = json.loads(self.result_json)
+        return f"event: {result['event']}\ndata: {json.dumps(result['data'])}\n\n"
+
+
+class SyncJobEvent(db.Model):
+    """Log message of a running sync job, tailed by the browser over Server-Sent Events"""
+    __tablename__ = 'sync_job_events'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('sync_jobs.id'), nullable=False, index=True)
+    event = db.Column(db.String(20))
+    data_json = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_sse(self):
+        """The event in text/event-stream format, with its id for resuming"""
+        lines = f"id: {self.id}\n"
+        if self.event:
+            lines += f"event: {self.event}\n"
+        return lines + f"data: {self.data_json}\n\n"
+
+
 # Make models available to blueprints via app
 app.User = User
 app.SpotifyCredentials = SpotifyCredentials  
 app.YTMusicCredentials = YTMusicCredentials
 app.SyncHistory = SyncHistory
+app.SyncJob = SyncJob
+app.SyncJobEvent = SyncJobEvent
 app.db = db
 app.bcrypt = bcrypt
 
@@ -11,3 +11,5 @@ with app.app_context():
     print("- spotify_credentials")
     print("- ytmusic_credentials")
     print("- sync_history")
+    print("- sync_jobs")
+    print("- sync_job_events")
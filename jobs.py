@@ -0,0 +1,231 @@
+"""
+Background jobs: run syncs on worker threads, outside of the request that started them
+
+A job is a SyncJob row. Its runner reports progress through `emit()`: the latest
+status and percent are kept on the job, log messages are stored as SyncJobEvent rows,
+and both are written at most every FLUSH_SECONDS. Any request (in any worker
+process) can tail the job's progress, and the job carries on if nobody is listening.
+
+Jobs run in the process that queued them. Each process marks its jobs alive every
+HEARTBEAT_SECONDS, so the jobs of a process that died (a restarted gunicorn worker)
+can be recognised and failed.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import json
+import os
+import threading
+import time
+import traceback
+
+JOB_WORKERS = int(os.environ.get('SYNC_JOB_WORKERS', 4))
+
+# Progress of a job is written to the database at most this often
+FLUSH_SECONDS = 1.0
+
+# Jobs whose heartbeat is older than STALE_SECONDS are orphaned
+HEARTBEAT_SECONDS = 30
+STALE_SECONDS = 120
+
+# The log of a finished job is kept this long for its tails to catch up
+KEEP_LOG_SECONDS = 10 * 60
+
+# Events that end a job
+FINAL_EVENTS = ('complete', 'error')
+
+_runners = {}
+_executor = None
+_executor_lock = threading.Lock()
+
+# Ids of the jobs queued or running in this process
+_active = set()
+_active_lock = threading.Lock()
+
+
+def runner(kind):
+    """Register fn(job, emit) as the runner of jobs of `kind`
+
+    `emit(data, event=None)` records progress: the 'status' and 'percent' of `data`
+    update the job's progress, its 'message' (and 'type') is added to the job's log.
+    The job fails if it emits an 'error' event or raises, and completes otherwise.
+    """
+    def register(fn):
+        _runners[kind] = fn
+        return fn
+    return register
+
+
+def get_executor(app):
+    """The pool of worker threads shared by all jobs of this process
+
+    The first call also fails the jobs orphaned by processes that have died, and
+    starts this process's heartbeat.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            fail_orphaned_jobs(app)
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='sync-job')
+            threading.Thread(target=_heartbeat, args=(app,), name='sync-job-heartbeat', daemon=True).start()
+        return _executor
+
+
+def enqueue(app, user_id, kind, params):
+    """Create a job of `kind` for the user and queue it, returns the SyncJob"""
+    if kind not in _runners:
+        raise ValueError(f'Unknown job kind {kind!r}')
+
+    executor = get_executor(app)
+
+    db = app.db
+    job = app.SyncJob(user_id=user_id, kind=kind, status='queued')
+    job.set_params(params)
+    db.session.add(job)
+    db.session.commit()
+
+    with _active_lock:
+        _active.add(job.id)
+    executor.submit(_run, app, job.id)
+    return job
+
+
+def is_stale(job):
+    """Has the process running `job` stopped sending heartbeats?"""
+    if job.is_finished() or job.heartbeat_at is None:
+        return False
+    return job.heartbeat_at < datetime.utcnow() - timedelta(seconds=STALE_SECONDS)
+
+
+def fail_orphaned_jobs(app):
+    """Fail the unfinished jobs of processes that have died, returns how many"""
+    SyncJob = app.SyncJob
+    db = app.db
+    cutoff = datetime.utcnow() - timedelta(seconds=STALE_SECONDS)
+    try:
+        orphans = SyncJob.query.filter(
+            SyncJob.status.in_(('queued', 'running')), SyncJob.heartbeat_at < cutoff
+        ).all()
+        for job in orphans:
+            _finish(app, job, 'error', {'message': 'The sync was interrupted by a server restart, please start it again'})
+        db.session.commit()
+    except Exception:
+        traceback.print_exc()
+        db.session.rollback()
+        return 0
+    return len(orphans)
+
+
+def _finish(app, job, event, data):
+    """Record the final event of `job`, the caller commits
+
+    The logs of jobs that finished more than KEEP_LOG_SECONDS ago, by which time
+    they have been tailed, are dropped.
+    """
+    SyncJob = app.SyncJob
+    SyncJobEvent = app.SyncJobEvent
+    job.status = 'failed' if event == 'error' else 'completed'
+    job.finished_at = datetime.utcnow()
+    job.result_json = json.dumps({'event': event, 'data': data})
+
+    cutoff = datetime.utcnow() - timedelta(seconds=KEEP_LOG_SECONDS)
+    finished = app.db.session.query(SyncJob.id).filter(SyncJob.finished_at < cutoff)
+    SyncJobEvent.query.filter(SyncJobEvent.job_id.in_(finished)).delete(synchronize_session=False)
+
+
+def _heartbeat(app):
+    while True:
+        time.sleep(HEARTBEAT_SECONDS)
+        with _active_lock:
+            job_ids = list(_active)
+        if not job_ids:
+            continue
+        with app.app_context():
+            SyncJob = app.SyncJob
+            try:
+                SyncJob.query.filter(SyncJob.id.in_(job_ids)).update(
+                    {'heartbeat_at': datetime.utcnow()}, synchronize_session=False
+                )
+                app.db.session.commit()
+            except Exception:
+                traceback.print_exc()
+                app.db.session.rollback()
+
+
+class _Progress:
+    """The `emit` of a job, buffering its progress between writes"""
+
+    def __init__(self, app, job_id):
+        self.app = app
+        self.job_id = job_id
+        self.progress = {}
+        self.messages = []
+        self.final = None
+        self._dirty = False
+        self._flushed_at = 0.0
+
+    def __call__(self, data, event=None):
+        if event in FINAL_EVENTS:
+            # Written by _run once the runner has returned
+            self.final = (event, data)
+            return
+        progress = {key: data[key] for key in ('status', 'percent') if key in data}
+        if progress:
+            self.progress.update(progress)
+            self._dirty = True
+        if 'message' in data:
+            self.messages.append((event, {key: data[key] for key in ('message', 'type') if key in data}))
+        if time.monotonic() - self._flushed_at >= FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered progress, a failed write is retried by the next flush"""
+        if not self._dirty and not self.messages:
+            return
+        db = self.app.db
+        try:
+            job = db.session.get(self.app.SyncJob, self.job_id)
+            job.progress_json = json.dumps(self.progress)
+            job.heartbeat_at = datetime.utcnow()
+            for event, data in self.messages:
+                db.session.add(self.app.SyncJobEvent(job_id=self.job_id, event=event, data_json=json.dumps(data)))
+            db.session.commit()
+        except Exception:
+            traceback.print_exc()
+            db.session.rollback()
+            return
+        self.messages = []
+        self._dirty = False
+        self._flushed_at = time.monotonic()
+
+
+def _run(app, job_id):
+    with app.app_context():
+        db = app.db
+        try:
+            job = db.session.get(app.SyncJob, job_id)
+            job.status = 'running'
+            job.started_at = datetime.utcnow()
+            job.heartbeat_at = datetime.utcnow()
+            db.session.commit()
+
+            emit = _Progress(app, job_id)
+            try:
+                _runners[job.kind](job, emit)
+            except Exception as e:
+                traceback.print_exc()
+                db.session.rollback()
+                emit({'message': str(e)}, 'error')
+
+            emit.flush()
+            event, data = emit.final or ('complete', {'status': 'Sync complete', 'percent': 100})
+            _finish(app, db.session.get(app.SyncJob, job_id), event, data)
+            db.session.commit()
+        except Exception:
+            # Without heartbeats the job is failed as orphaned
+            traceback.print_exc()
+            db.session.rollback()
+        finally:
+            with _active_lock:
+                _active.discard(job_id)
+            db.session.remove()
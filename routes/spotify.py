@@ -202,7 +202,8 @@ def playlists_data():
 @login_required
 def backup():
     """Trigger Spotify backup to download playlists"""
-    from spotify2ytmusic.spotify_backup import SpotifyAPI
+    from spotify2ytmusic.compression import open_text
+    from spotify2ytmusic.spotify_backup import SpotifyAPI, SpotifyAPIError
     from flask import current_app
     SpotifyCredentials = current_app.SpotifyCredentials
     
@@ -223,18 +224,37 @@ def backup():
         playlists = sp.list('me/playlists')
         liked_songs = sp.list('me/tracks')
         
-        # Save to file
-        playlists_file = os.path.join(user_data_dir, 'playlists.json')
+        # Save to file, streamed out compressed (without indentation), and only
+        # replacing the previous backup once it is complete
+        playlists_file = os.path.join(user_data_dir, 'playlists.json.gz')
         data = {
             'playlists': playlists,
             'liked': liked_songs
         }
         
-        with open(playlists_file, 'w') as f:
-            json.dump(data, f, indent=2)
+        tmp_file = f'{playlists_file}.tmp'
+        try:
+            with open_text(tmp_file, 'w', compression='gzip') as f:
+                json.dump(data, f)
+            os.replace(tmp_file, playlists_file)
+        except BaseException:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+        
+        # Backups used to be saved uncompressed, the new one replaces them
+        old_playlists_file = os.path.join(user_data_dir, 'playlists.json')
+        if os.path.exists(old_playlists_file):
+            os.remove(old_playlists_file)
         
         flash('Spotify playlists backed up successfully!', 'success')
-        return {'success': True, 'playlists_count': len(playlists)}
+        return {
+            'success': True,
+            'playlists_count': len(playlists),
+            'transport': sp.transport.stats(),
+        }
     
+    except SpotifyAPIError as e:
+        return {'success': False, 'error': str(e), 'status': e.status}, 502
     except Exception as e:
         return {'success': False, 'error': str(e)}, 500
@@ -4,11 +4,73 @@ Sync routes: handle playlist and liked songs syncing between services
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context
 from flask_login import login_required, current_user
-import json
+import os
+import threading
 import time
 
+import jobs
+from spotify2ytmusic.match_cache import MatchCache, DEFAULT_CACHE_FILE
+from spotify2ytmusic.ratelimit import RateLimited, get_limiter, parse_retry_after
+
 bp = Blueprint('sync', __name__, url_prefix='/sync')
 
+SPOTIFY_TRIES = 5
+
+# Number of Spotify searches run concurrently by a YouTube Music → Spotify sync,
+# the requests are still paced by the shared Spotify rate limiter
+SPOTIFY_SEARCH_WORKERS = 8
+
+# Number of videoIds added to the YouTube Music playlist per add_playlist_items call
+YTMUSIC_BATCH_SIZE = 50
+
+# A job's event stream is polled every TAIL_POLL_SECONDS, and closed after
+# TAIL_SECONDS for the browser to reconnect (after TAIL_RETRY_MS)
+TAIL_POLL_SECONDS = 1
+TAIL_SECONDS = 20
+TAIL_RETRY_MS = 500
+
+_match_cache = None
+_match_cache_lock = threading.Lock()
+
+
+def spotify_request(method, url, **kwargs):
+    """requests.request() paced by the shared Spotify rate limiter
+
+    429 and 5xx responses are retried (honoring Retry-After) up to SPOTIFY_TRIES
+    times, the last response is returned either way.
+    """
+    import requests
+    limiter = get_limiter('spotify')
+    for attempt in range(SPOTIFY_TRIES):
+        limiter.acquire()
+        response = requests.request(method, url, **kwargs)
+        if response.status_code != 429 and response.status_code < 500:
+            limiter.success()
+            return response
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        limiter.failure(retry_after, throttled=response.status_code == 429)
+        if attempt < SPOTIFY_TRIES - 1 and retry_after is None:
+            time.sleep(limiter.backoff(attempt))
+    return response
+
+
+def get_ytmusic(ytmusic_creds):
+    """YTMusic client for the user, paced by the shared YTMusic rate limiter"""
+    from ytmusicapi import YTMusic
+    return RateLimited(YTMusic(auth=ytmusic_creds.get_headers()), get_limiter('ytmusic'))
+
+
+def get_match_cache():
+    """Spotify → YouTube Music match cache shared by all syncs, in the upload folder"""
+    from flask import current_app
+    global _match_cache
+    with _match_cache_lock:
+        if _match_cache is None:
+            filename = os.path.join(current_app.config['UPLOAD_FOLDER'], DEFAULT_CACHE_FILE)
+            # The upload folder may be a network volume, where WAL is not safe
+            _match_cache = MatchCache(filename, journal_mode='DELETE')
+        return _match_cache
+
 
 @bp.route('/spotify-to-ytmusic')
 @login_required
@@ -68,305 +130,427 @@ def history():
     return render_template('sync/history.html', history=history)
 
 
-@bp.route('/start')
+@bp.route('/start', methods=['POST'])
 @login_required
 def start_sync():
-    """Start playlist sync with Server-Sent Events for progress"""
+    """Queue a Spotify → YouTube Music playlist sync, tailed from job_events"""
+    from flask import current_app
+    
+    params = {
+        'playlist_id': request.form.get('playlist_id'),
+        'name': request.form.get('name', ''),
+        'algo': int(request.form.get('algo', 1)),
+    }
+    job = jobs.enqueue(current_app._get_current_object(), current_user.id, 'spotify_to_ytmusic', params)
+    return jsonify({'job_id': job.id, 'events_url': url_for('sync.job_events', job_id=job.id)})
+
+
+@jobs.runner('spotify_to_ytmusic')
+def run_spotify_to_ytmusic(job, emit):
+    """Sync a Spotify playlist to a new YouTube Music playlist"""
     from flask import current_app
     from spotify2ytmusic import backend
-    from ytmusicapi import YTMusic
-    import requests
+    from spotify2ytmusic.response_cache import CachingYTMusic
     
-    playlist_id = request.args.get('playlist_id')
-    new_playlist_name = request.args.get('name', '')
-    algo = int(request.args.get('algo', 1))
+    params = job.get_params()
+    playlist_id = params['playlist_id']
+    new_playlist_name = params.get('name', '')
+    algo = params.get('algo', 1)
     
     SpotifyCredentials = current_app.SpotifyCredentials
     YTMusicCredentials = current_app.YTMusicCredentials
     db = current_app.db
     SyncHistory = current_app.SyncHistory
     
-    spotify_creds = SpotifyCredentials.query.filter_by(user_id=current_user.id).first()
-    ytmusic_creds = YTMusicCredentials.query.filter_by(user_id=current_user.id).first()
+    spotify_creds = SpotifyCredentials.query.filter_by(user_id=job.user_id).first()
+    ytmusic_creds = YTMusicCredentials.query.filter_by(user_id=job.user_id).first()
     
-    def generate():
-        sync_record = None
-        try:
-            # Initialize YTMusic
-            yield f"data: {json.dumps({'status': 'Initializing YouTube Music...', 'percent': 5})}\n\n"
-            ytmusic = YTMusic(auth=ytmusic_creds.get_headers())
-            
-            # Fetch Spotify playlist
-            yield f"data: {json.dumps({'status': 'Fetching Spotify playlist...', 'percent': 10})}\n\n"
-            headers = {'Authorization': f'Bearer {spotify_creds.access_token}'}
-            pl_response = requests.get(f'https://api.spotify.com/v1/playlists/{playlist_id}', headers=headers)
-            
-            if pl_response.status_code != 200:
-                yield f"event: error\ndata: {json.dumps({'message': 'Failed to fetch playlist'})}\n\n"
-                return
-            
-            playlist = pl_response.json()
-            playlist_name = new_playlist_name if new_playlist_name else playlist['name']
-            
-            # Create sync history record
-            sync_record = SyncHistory(
-                user_id=current_user.id,
-                sync_type='playlist',
-                direction='spotify_to_ytmusic',
-                playlist_name=playlist_name,
-                source_id=playlist_id,
-                status='running'
-            )
-            db.session.add(sync_record)
-            db.session.commit()
-            
-            total_tracks = playlist['tracks']['total']
-            yield f"data: {json.dumps({'status': f'Found {total_tracks} tracks', 'percent': 15})}\n\n"
-            
-            # Fetch all tracks
-            tracks = []
-            url = playlist['tracks']['href']
-            while url:
-                response = requests.get(url, headers=headers)
-                data = response.json()
-                tracks.extend(data['items'])
-                url = data.get('next')
-                percent = 15 + (len(tracks) / total_tracks * 10)
-                yield f"data: {json.dumps({'status': f'Loading tracks: {len(tracks)}/{total_tracks}', 'percent': percent})}\n\n"
-            
-            # Update total tracks
-            sync_record.tracks_total = total_tracks
-            db.session.commit()
-            
-            # Create YouTube Music playlist
-            yield f"data: {json.dumps({'status': 'Creating YouTube Music playlist...', 'percent': 30})}\n\n"
-            yt_playlist_id = ytmusic.create_playlist(playlist_name, f'Synced from Spotify')
-            sync_record.destination_id = yt_playlist_id
-            db.session.commit()
-            
-            # Sync tracks
-            synced = 0
-            failed = 0
-            for i, item in enumerate(tracks):
+    sync_record = None
+    try:
+        # Initialize YTMusic
+        emit({'status': 'Initializing YouTube Music...', 'percent': 5})
+        ytmusic = CachingYTMusic(get_ytmusic(ytmusic_creds))
+        match_cache = get_match_cache()
+        album_index = backend.AlbumIndex()
+        
+        # Fetch Spotify playlist
+        emit({'status': 'Fetching Spotify playlist...', 'percent': 10})
+        headers = {'Authorization': f'Bearer {spotify_creds.access_token}'}
+        pl_response = spotify_request('GET', f'https://api.spotify.com/v1/playlists/{playlist_id}', headers=headers)
+        
+        if pl_response.status_code != 200:
+            emit({'message': 'Failed to fetch playlist'}, 'error')
+            return
+        
+        playlist = pl_response.json()
+        playlist_name = new_playlist_name if new_playlist_name else playlist['name']
+        
+        # Create sync history record
+        sync_record = SyncHistory(
+            user_id=job.user_id,
+            sync_type='playlist',
+            direction='spotify_to_ytmusic',
+            playlist_name=playlist_name,
+            source_id=playlist_id,
+            status='running'
+        )
+        db.session.add(sync_record)
+        db.session.commit()
+        
+        total_tracks = playlist['tracks']['total']
+        emit({'status': f'Found {total_tracks} tracks', 'percent': 15})
+        
+        # Update total tracks
+        sync_record.tracks_total = total_tracks
+        db.session.commit()
+        
+        def fetch_pages():
+            # The playlist comes with its first page of tracks
+            page = playlist['tracks']
+            while True:
+                yield page['items']
+                if not page.get('next'):
+                    return
+                page = spotify_request('GET', page['next'], headers=headers).json()
+        
+        def iter_tracks():
+            # The next page is fetched while the tracks of this one are being matched
+            loaded = 0
+            for items in backend.prefetch(fetch_pages()):
+                loaded += len(items)
+                emit({'message': f'Loaded tracks: {loaded}/{total_tracks}'})
+                yield from items
+        
+        # Create YouTube Music playlist
+        emit({'status': 'Creating YouTube Music playlist...', 'percent': 30})
+        yt_playlist_id = ytmusic.create_playlist(playlist_name, f'Synced from Spotify')
+        sync_record.destination_id = yt_playlist_id
+        db.session.commit()
+        
+        # Sync tracks, adding the matches to the playlist YTMUSIC_BATCH_SIZE at a time
+        synced = 0
+        failed = 0
+        added_video_ids = set()
+        
+        def on_added(tokens):
+            nonlocal synced
+            synced += len(tokens)
+            emit({'message': f'Added {synced} tracks to the playlist', 'type': 'success'})
+        
+        def on_rejected(tokens):
+            for track_name in tokens:
+                emit({'message': f'Not added: {track_name}', 'type': 'danger'})
+        
+        with backend.PlaylistWriter(ytmusic, yt_playlist_id, YTMUSIC_BATCH_SIZE,
+                                    on_added=on_added, on_rejected=on_rejected) as writer:
+            for i, item in enumerate(iter_tracks()):
                 if not item or not item.get('track'):
                     continue
                     
                 track = item['track']
                 track_name = track['name']
                 artist_name = track['artists'][0]['name'] if track['artists'] else ''
+                album_name = (track.get('album') or {}).get('name', '')
                 
                 percent = 30 + ((i + 1) / total_tracks * 65)
-                yield f"data: {json.dumps({'status': f'Syncing: {track_name} - {artist_name}', 'percent': percent, 'message': f'{i+1}/{total_tracks}: {track_name}'})}\n\n"
+                emit({'status': f'Syncing: {track_name} - {artist_name}', 'percent': percent, 'message': f'{i+1}/{total_tracks}: {track_name}'})
                 
                 try:
-                    # Search on YouTube Music
-                    query = f'{track_name} {artist_name}'
-                    search_results = ytmusic.search(query, filter='songs', limit=5)
+                    # Match on YouTube Music the same way the CLI does
+                    try:
+                        song = backend.lookup_song(
+                            ytmusic, track_name, artist_name, album_name, algo,
+                            match_cache=match_cache, album_index=album_index
+                        )
+                    except (ValueError, IndexError):
+                        song = None
                     
-                    if search_results:
-                        video_id = search_results[0]['videoId']
-                        ytmusic.add_playlist_items(yt_playlist_id, [video_id])
-                        synced += 1
-                    else:
+                    if not song:
                         failed += 1
-                        yield f"data: {json.dumps({'message': f'Not found: {track_name}', 'type': 'danger'})}\n\n"
+                        emit({'message': f'Not found: {track_name}', 'type': 'danger'})
+                    elif song['videoId'] in added_video_ids:
+                        # YouTube Music would reject the duplicate, failing the whole batch
+                        emit({'message': f'Duplicate: {track_name}', 'type': 'warning'})
+                    else:
+                        added_video_ids.add(song['videoId'])
+                        writer.add(song['videoId'], track_name)
                 except Exception as e:
                     failed += 1
-                    yield f"data: {json.dumps({'message': f'Error: {track_name} - {str(e)}', 'type': 'danger'})}\n\n"
-            
-            # Complete - update sync record
-            if sync_record:
-                sync_record.status = 'completed'
-                sync_record.tracks_synced = synced
-                sync_record.tracks_failed = failed
-                sync_record.completed_at = db.func.now()
-                db.session.commit()
-            
-            yield f"event: complete\ndata: {json.dumps({'status': f'Complete! {synced} synced, {failed} failed', 'percent': 100, 'message': 'Sync completed successfully!', 'type': 'success'})}\n\n"
-            
-        except Exception as e:
-            if sync_record:
-                sync_record.status = 'failed'
-                sync_record.error_message = str(e)
-                sync_record.completed_at = db.func.now()
-                db.session.commit()
-            yield f"event: error\ndata: {json.dumps({'message': str(e)})}\n\n"
-    
-    return Response(stream_with_context(generate()), mimetype='text/event-stream')
+                    emit({'message': f'Error: {track_name} - {str(e)}', 'type': 'danger'})
+        
+        failed += len(writer.failed) + len(writer.rejected)
+        
+        # Complete - update sync record
+        if sync_record:
+            sync_record.status = 'completed'
+            sync_record.tracks_synced = synced
+            sync_record.tracks_failed = failed
+            sync_record.completed_at = db.func.now()
+            db.session.commit()
+        
+        emit({'status': f'Complete! {synced} synced, {failed} failed', 'percent': 100, 'message': 'Sync completed successfully!', 'type': 'success'}, 'complete')
+        
+    except Exception as e:
+        db.session.rollback()
+        if sync_record:
+            sync_record.status = 'failed'
+            sync_record.error_message = str(e)
+            sync_record.completed_at = db.func.now()
+            db.session.commit()
+        emit({'message': str(e)}, 'error')
 
 
-@bp.route('/start-ytmusic-to-spotify')
+@bp.route('/start-ytmusic-to-spotify', methods=['POST'])
 @login_required
 def start_ytmusic_to_spotify():
-    """Start YouTube Music to Spotify sync with Server-Sent Events for progress"""
+    """Queue a YouTube Music → Spotify playlist sync, tailed from job_events"""
     from flask import current_app
-    from ytmusicapi import YTMusic
-    import requests
     
-    playlist_id = request.args.get('playlist_id')
-    new_playlist_name = request.args.get('name', '')
+    params = {
+        'playlist_id': request.form.get('playlist_id'),
+        'name': request.form.get('name', ''),
+    }
+    job = jobs.enqueue(current_app._get_current_object(), current_user.id, 'ytmusic_to_spotify', params)
+    return jsonify({'job_id': job.id, 'events_url': url_for('sync.job_events', job_id=job.id)})
+
+
+@jobs.runner('ytmusic_to_spotify')
+def run_ytmusic_to_spotify(job, emit):
+    """Sync a YouTube Music playlist to a new Spotify playlist"""
+    from flask import current_app
+    from spotify2ytmusic import backend
+    
+    params = job.get_params()
+    playlist_id = params['playlist_id']
+    new_playlist_name = params.get('name', '')
     
     SpotifyCredentials = current_app.SpotifyCredentials
     YTMusicCredentials = current_app.YTMusicCredentials
     db = current_app.db
     SyncHistory = current_app.SyncHistory
     
-    spotify_creds = SpotifyCredentials.query.filter_by(user_id=current_user.id).first()
-    ytmusic_creds = YTMusicCredentials.query.filter_by(user_id=current_user.id).first()
+    spotify_creds = SpotifyCredentials.query.filter_by(user_id=job.user_id).first()
+    ytmusic_creds = YTMusicCredentials.query.filter_by(user_id=job.user_id).first()
     
-    def generate():
-        sync_record = None
-        try:
-            # Initialize services
-            yield f"data: {json.dumps({'status': 'Initializing services...', 'percent': 5})}\n\n"
-            ytmusic = YTMusic(auth=ytmusic_creds.get_headers())
-            
-            # Fetch YouTube Music playlist
-            yield f"data: {json.dumps({'status': 'Fetching YouTube Music playlist...', 'percent': 10})}\n\n"
-            playlist = ytmusic.get_playlist(playlist_id, limit=None)
-            
-            if not playlist:
-                yield f"event: error\ndata: {json.dumps({'message': 'Failed to fetch playlist'})}\n\n"
-                return
-            
-            playlist_name = new_playlist_name if new_playlist_name else playlist['title']
-            tracks = playlist.get('tracks', [])
-            total_tracks = len(tracks)
-            
-            # Create sync history record
-            sync_record = SyncHistory(
-                user_id=current_user.id,
-                sync_type='playlist',
-                direction='ytmusic_to_spotify',
-                playlist_name=playlist_name,
-                source_id=playlist_id,
-                tracks_total=total_tracks,
-                status='running'
-            )
-            db.session.add(sync_record)
-            db.session.commit()
-            
-            yield f"data: {json.dumps({'status': f'Found {total_tracks} tracks', 'percent': 15})}\n\n"
-            
-            # Create Spotify playlist
-            yield f"data: {json.dumps({'status': 'Creating Spotify playlist...', 'percent': 20})}\n\n"
-            headers = {
-                'Authorization': f'Bearer {spotify_creds.access_token}',
-                'Content-Type': 'application/json'
+    sync_record = None
+    try:
+        # Initialize services
+        emit({'status': 'Initializing services...', 'percent': 5})
+        ytmusic = get_ytmusic(ytmusic_creds)
+        
+        # Fetch YouTube Music playlist
+        emit({'status': 'Fetching YouTube Music playlist...', 'percent': 10})
+        playlist = ytmusic.get_playlist(playlist_id, limit=None)
+        
+        if not playlist:
+            emit({'message': 'Failed to fetch playlist'}, 'error')
+            return
+        
+        playlist_name = new_playlist_name if new_playlist_name else playlist['title']
+        tracks = playlist.get('tracks', [])
+        total_tracks = len(tracks)
+        
+        # Create sync history record
+        sync_record = SyncHistory(
+            user_id=job.user_id,
+            sync_type='playlist',
+            direction='ytmusic_to_spotify',
+            playlist_name=playlist_name,
+            source_id=playlist_id,
+            tracks_total=total_tracks,
+            status='running'
+        )
+        db.session.add(sync_record)
+        db.session.commit()
+        
+        emit({'status': f'Found {total_tracks} tracks', 'percent': 15})
+        
+        # Create Spotify playlist
+        emit({'status': 'Creating Spotify playlist...', 'percent': 20})
+        headers = {
+            'Authorization': f'Bearer {spotify_creds.access_token}',
+            'Content-Type': 'application/json'
+        }
+        
+        # Get user ID
+        user_response = spotify_request('GET', 'https://api.spotify.com/v1/me', headers=headers)
+        if user_response.status_code != 200:
+            error_msg = f'Failed to get Spotify user info (Status {user_response.status_code})'
+            try:
+                error_data = user_response.json()
+                error_msg += f': {error_data.get("error", {}).get("message", "")}'
+            except:
+                pass
+            emit({'message': error_msg}, 'error')
+            return
+        
+        spotify_user_id = user_response.json()['id']
+        
+        # Create playlist
+        create_response = spotify_request(
+            'POST',
+            f'https://api.spotify.com/v1/users/{spotify_user_id}/playlists',
+            headers=headers,
+            json={
+                'name': playlist_name,
+                'description': 'Synced from YouTube Music',
+                'public': False
             }
+        )
+        
+        if create_response.status_code not in [200, 201]:
+            error_msg = f'Failed to create Spotify playlist (Status {create_response.status_code})'
+            try:
+                error_data = create_response.json()
+                error_msg += f': {error_data.get("error", {}).get("message", "")}'
+            except:
+                error_msg += f' - Response: {create_response.text[:200]}'
+            emit({'message': error_msg}, 'error')
+            return
+        
+        spotify_playlist_id = create_response.json()['id']
+        sync_record.destination_id = spotify_playlist_id
+        db.session.commit()
+        
+        # Sync tracks, searching SPOTIFY_SEARCH_WORKERS at a time but adding the
+        # results to the playlist in the original order
+        synced = 0
+        failed = 0
+        track_uris = []
+        
+        def search(item):
+            i, track = item
+            artists = track.get('artists', [])
+            query = f"{track.get('title', '')} {artists[0]['name'] if artists else ''}"
+            try:
+                return spotify_request(
+                    'GET',
+                    'https://api.spotify.com/v1/search',
+                    headers=headers,
+                    params={'q': query, 'type': 'track', 'limit': 5}
+                ), None
+            except Exception as e:
+                return None, e
+        
+        source_tracks = ((i, track) for i, track in enumerate(tracks) if track)
+        for (i, track), (search_response, search_error) in backend.imap_ordered(
+            search, source_tracks, SPOTIFY_SEARCH_WORKERS
+        ):
+            track_title = track.get('title', '')
+            artists = track.get('artists', [])
+            artist_name = artists[0]['name'] if artists else ''
             
-            # Get user ID
-            user_response = requests.get('https://api.spotify.com/v1/me', headers=headers)
-            if user_response.status_code != 200:
-                error_msg = f'Failed to get Spotify user info (Status {user_response.status_code})'
-                try:
-                    error_data = user_response.json()
-                    error_msg += f': {error_data.get("error", {}).get("message", "")}'
-                except:
-                    pass
-                yield f"event: error\ndata: {json.dumps({'message': error_msg})}\n\n"
-                return
-            
-            spotify_user_id = user_response.json()['id']
-            
-            # Create playlist
-            create_response = requests.post(
-                f'https://api.spotify.com/v1/users/{spotify_user_id}/playlists',
-                headers=headers,
-                json={
-                    'name': playlist_name,
-                    'description': 'Synced from YouTube Music',
-                    'public': False
-                }
-            )
-            
-            if create_response.status_code not in [200, 201]:
-                error_msg = f'Failed to create Spotify playlist (Status {create_response.status_code})'
-                try:
-                    error_data = create_response.json()
-                    error_msg += f': {error_data.get("error", {}).get("message", "")}'
-                except:
-                    error_msg += f' - Response: {create_response.text[:200]}'
-                yield f"event: error\ndata: {json.dumps({'message': error_msg})}\n\n"
-                return
-            
-            spotify_playlist_id = create_response.json()['id']
-            sync_record.destination_id = spotify_playlist_id
-            db.session.commit()
-            
-            # Sync tracks
-            synced = 0
-            failed = 0
-            track_uris = []
+            percent = 25 + ((i + 1) / total_tracks * 70)
+            emit({'status': f'Syncing: {track_title} - {artist_name}', 'percent': percent, 'message': f'{i+1}/{total_tracks}: {track_title}'})
             
-            for i, track in enumerate(tracks):
-                if not track:
-                    continue
-                
-                track_title = track.get('title', '')
-                artists = track.get('artists', [])
-                artist_name = artists[0]['name'] if artists else ''
+            try:
+                if search_error is not None:
+                    raise search_error
                 
-                percent = 25 + ((i + 1) / total_tracks * 70)
-                yield f"data: {json.dumps({'status': f'Syncing: {track_title} - {artist_name}', 'percent': percent, 'message': f'{i+1}/{total_tracks}: {track_title}'})}\n\n"
-                
-                try:
-                    # Search on Spotify
-                    query = f'{track_title} {artist_name}'
-                    search_response = requests.get(
-                        'https://api.spotify.com/v1/search',
-                        headers=headers,
-                        params={'q': query, 'type': 'track', 'limit': 5}
-                    )
-                    
-                    if search_response.status_code == 200:
-                        results = search_response.json().get('tracks', {}).get('items', [])
-                        if results:
-                            track_uris.append(results[0]['uri'])
-                            synced += 1
-                            
-                            # Add tracks in batches of 100
-                            if len(track_uris) >= 100:
-                                requests.post(
-                                    f'https://api.spotify.com/v1/playlists/{spotify_playlist_id}/tracks',
-                                    headers=headers,
-                                    json={'uris': track_uris}
-                                )
-                                track_uris = []
-                        else:
-                            failed += 1
-                            yield f"data: {json.dumps({'message': f'Not found: {track_title}', 'type': 'warning'})}\n\n"
+                if search_response.status_code == 200:
+                    results = search_response.json().get('tracks', {}).get('items', [])
+                    if results:
+                        track_uris.append(results[0]['uri'])
+                        synced += 1
+                        
+                        # Add tracks in batches of 100
+                        if len(track_uris) >= 100:
+                            spotify_request(
+                                'POST',
+                                f'https://api.spotify.com/v1/playlists/{spotify_playlist_id}/tracks',
+                                headers=headers,
+                                json={'uris': track_uris}
+                            )
+                            track_uris = []
                     else:
                         failed += 1
-                        
-                except Exception as e:
+                        emit({'message': f'Not found: {track_title}', 'type': 'warning'})
+                else:
                     failed += 1
-                    yield f"data: {json.dumps({'message': f'Error: {track_title} - {str(e)}', 'type': 'danger'})}\n\n"
+                    
+            except Exception as e:
+                failed += 1
+                emit({'message': f'Error: {track_title} - {str(e)}', 'type': 'danger'})
+        
+        # Add remaining tracks
+        if track_uris:
+            spotify_request(
+                'POST',
+                f'https://api.spotify.com/v1/playlists/{spotify_playlist_id}/tracks',
+                headers=headers,
+                json={'uris': track_uris}
+            )
+        
+        # Complete - update sync record
+        if sync_record:
+            sync_record.status = 'completed'
+            sync_record.tracks_synced = synced
+            sync_record.tracks_failed = failed
+            sync_record.completed_at = db.func.now()
+            db.session.commit()
+        
+        emit({'status': f'Complete! {synced} synced, {failed} failed', 'percent': 100, 'message': 'Sync completed successfully!', 'type': 'success'}, 'complete')
+        
+    except Exception as e:
+        db.session.rollback()
+        if sync_record:
+            sync_record.status = 'failed'
+            sync_record.error_message = str(e)
+            sync_record.completed_at = db.func.now()
+            db.session.commit()
+        emit({'message': str(e)}, 'error')
+
+
+@bp.route('/jobs/<int:job_id>/events')
+@login_required
+def job_events(job_id):
+    """Tail a sync job's progress with Server-Sent Events
+    
+    The stream ends after TAIL_SECONDS, well within the gunicorn timeout, and the
+    browser reconnects with the Last-Event-ID header to pick up where it left off.
+    Streams are short so they don't tie up request threads, the job itself runs on
+    the background workers and is unaffected either way.
+    """
+    from flask import current_app
+    SyncJob = current_app.SyncJob
+    SyncJobEvent = current_app.SyncJobEvent
+    db = current_app.db
+    
+    # Users can only tail their own jobs
+    SyncJob.query.filter_by(id=job_id, user_id=current_user.id).first_or_404()
+    last_event_id = request.headers.get('Last-Event-ID', 0, type=int)
+    app = current_app._get_current_object()
+    
+    def generate():
+        last_id = last_event_id
+        last_progress = None
+        deadline = time.monotonic() + TAIL_SECONDS
+        yield f"retry: {TAIL_RETRY_MS}\n\n"
+        while True:
+            job = db.session.get(SyncJob, job_id)
+            if jobs.is_stale(job):
+                jobs.fail_orphaned_jobs(app)
+                job = db.session.get(SyncJob, job_id)
             
-            # Add remaining tracks
-            if track_uris:
-                requests.post(
-                    f'https://api.spotify.com/v1/playlists/{spotify_playlist_id}/tracks',
-                    headers=headers,
-                    json={'uris': track_uris}
-                )
+            events = SyncJobEvent.query.filter(
+                SyncJobEvent.job_id == job_id, SyncJobEvent.id > last_id
+            ).order_by(SyncJobEvent.id).all()
+            for event in events:
+                last_id = event.id
+                yield event.to_sse()
             
-            # Complete - update sync record
-            if sync_record:
-                sync_record.status = 'completed'
-                sync_record.tracks_synced = synced
-                sync_record.tracks_failed = failed
-                sync_record.completed_at = db.func.now()
-                db.session.commit()
+            if job.progress_json and job.progress_json != last_progress:
+                last_progress = job.progress_json
+                yield f"data: {job.progress_json}\n\n"
             
-            yield f"event: complete\ndata: {json.dumps({'status': f'Complete! {synced} synced, {failed} failed', 'percent': 100, 'message': 'Sync completed successfully!', 'type': 'success'})}\n\n"
+            if job.is_finished():
+                yield job.result_sse()
+                return
             
-        except Exception as e:
-            if sync_record:
-                sync_record.status = 'failed'
-                sync_record.error_message = str(e)
-                sync_record.completed_at = db.func.now()
-                db.session.commit()
-            yield f"event: error\ndata: {json.dumps({'message': str(e)})}\n\n"
+            # Don't hold a connection (or, on SQLite, a read lock) while waiting
+            db.session.close()
+            if time.monotonic() >= deadline:
+                return
+            time.sleep(TAIL_POLL_SECONDS)
     
     return Response(stream_with_context(generate()), mimetype='text/event-stream')
@@ -5,19 +5,53 @@ import sys
 import os
 import time
 import re
+import queue
+import sqlite3
+import threading
 
 from ytmusicapi import YTMusic
-from typing import Optional, Union, Iterator, Dict, List
-from collections import namedtuple
+from typing import (
+    Optional,
+    Union,
+    Iterator,
+    Iterable,
+    Dict,
+    List,
+    Tuple,
+    Callable,
+    Deque,
+    Any,
+    TypeVar,
+)
+from collections import namedtuple, OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
 
+from .match_cache import MatchCache, make_key
+from .response_cache import CachingYTMusic
+from .ratelimit import NON_RETRYABLE, RateLimited, get_limiter
+from .journal import CopyJournal
+from .stream_json import iter_array_items
+from .backup_db import BackupDB, is_backup_db
+from .compression import open_text
+from .backup_meta import is_reversed
+
 
 SongInfo = namedtuple("SongInfo", ["title", "artist", "album"])
 
+T = TypeVar("T")
+R = TypeVar("R")
+
+#  Number of videoIds added to a YTMusic playlist per add_playlist_items call
+DEFAULT_BATCH_SIZE = 50
+
 
 def get_ytmusic() -> YTMusic:
     """
     @@@
+
+    All calls made through the returned client are paced by the shared "ytmusic"
+    rate limiter.
     """
     if not os.path.exists("oauth.json"):
         print("ERROR: No file 'oauth.json' exists in the current directory.")
@@ -25,7 +59,7 @@ def get_ytmusic() -> YTMusic:
         sys.exit(1)
 
     try:
-        return YTMusic("oauth.json")
+        return RateLimited(YTMusic("oauth.json"), get_limiter("ytmusic"))
     except json.decoder.JSONDecodeError as e:
         print(f"ERROR: JSON Decode error while trying start YTMusic: {e}")
         print("       This typically means a problem with a 'oauth.json' file.")
@@ -34,7 +68,11 @@ def get_ytmusic() -> YTMusic:
 
 
 def _ytmusic_create_playlist(
-    yt: YTMusic, title: str, description: str, privacy_status: str = "PRIVATE"
+    yt: YTMusic,
+    title: str,
+    description: str,
+    privacy_status: str = "PRIVATE",
+    playlist_index: Optional["PlaylistIndex"] = None,
 ) -> str:
     """Wrapper on ytmusic.create_playlist
 
@@ -42,29 +80,25 @@ def _ytmusic_create_playlist(
     rate limit requests or otherwise fail.
 
     privacy_status can be: PRIVATE, PUBLIC, or UNLISTED
+
+    If a `playlist_index` is given, the new playlist is added to it.
     """
 
     def _create(
         yt: YTMusic, title: str, description: str, privacy_status: str
     ) -> Union[str, dict]:
-        exception_sleep = 5
-        for _ in range(10):
-            try:
-                """Create a playlist on YTMusic, retrying if it fails."""
-                id = yt.create_playlist(
+        """Create a playlist on YTMusic, retrying if it fails."""
+        try:
+            return get_limiter("ytmusic").retry(
+                lambda: yt.create_playlist(
                     title=title, description=description, privacy_status=privacy_status
-                )
-                return id
-            except Exception as e:
-                print(
-                    f"ERROR: (Retrying create_playlist: {title}) {e} in {exception_sleep} seconds"
-                )
-                time.sleep(exception_sleep)
-                exception_sleep *= 2
-
-        return {
-            "s2yt error": 'ERROR: Could not create playlist "{title}" after multiple retries'
-        }
+                ),
+                f"create_playlist: {title}",
+            )
+        except Exception as e:
+            return {
+                "s2yt error": f'ERROR: Could not create playlist "{title}" after multiple retries: {e}'
+            }
 
     id = _create(yt, title, description, privacy_status)
     #  create_playlist returns a dict if there was an error
@@ -74,12 +108,91 @@ def _ytmusic_create_playlist(
 
     time.sleep(1)  # seems to be needed to avoid missing playlist ID error
 
+    if playlist_index is not None:
+        playlist_index.add(title, id)
+
     return id
 
 
 def load_playlists_json(filename: str = "playlists.json", encoding: str = "utf-8"):
-    """Load the `playlists.json` Spotify playlist file"""
-    return json.load(open(filename, "r", encoding=encoding))
+    """Load the `playlists.json` Spotify playlist file (which may be compressed)"""
+    with open_text(filename, "r", encoding=encoding) as f:
+        return json.load(f)
+
+
+def iter_playlists_json(
+    key: str, filename: str = "playlists.json", encoding: str = "utf-8"
+) -> Iterator[Dict]:
+    """Stream the "playlists" or "albums" of the `playlists.json` file, one at a time.
+
+    Unlike `load_playlists_json` only one playlist/album is held in memory at once.
+    """
+    with open_text(filename, "r", encoding=encoding) as f:
+        yield from iter_array_items(f, key)
+
+
+def _is_spotify_playlist(src_pl: Dict, src_pl_id: Optional[str]) -> bool:
+    """Is `src_pl` the playlist `src_pl_id` (the "Liked Songs" playlist if None)?"""
+    if src_pl_id is None:
+        return str(src_pl.get("name")) == "Liked Songs"
+    return str(src_pl.get("id")) == src_pl_id
+
+
+class SpotifyBackup:
+    """A `playlists.json` backup, parsed once and indexed by playlist ID.
+
+    Commands that read several playlists (or read the file for more than one purpose)
+    should load the backup once and pass it to the `iter_spotify_*` functions, rather
+    than having each of them parse the file again.
+
+    `tracks_reversed` is set if the backup has been marked as reversed (see
+    `backup_meta.is_reversed`).
+    """
+
+    def __init__(self, data: Dict, tracks_reversed: bool = False):
+        self.data = data
+        self.tracks_reversed = tracks_reversed
+        self.playlists: List[Dict] = data.get("playlists", [])
+        self.albums: List[Dict] = data.get("albums", [])
+
+        self._by_id: Dict[str, Dict] = {}
+        self._liked: Optional[Dict] = None
+        for pl in self.playlists:
+            self._by_id.setdefault(str(pl.get("id")), pl)
+            if self._liked is None and _is_spotify_playlist(pl, None):
+                self._liked = pl
+
+    @classmethod
+    def load(
+        cls, filename: str = "playlists.json", encoding: str = "utf-8"
+    ) -> "SpotifyBackup":
+        return cls(load_playlists_json(filename, encoding), is_reversed(filename))
+
+    def find_playlist(self, src_pl_id: Optional[str]) -> Dict:
+        """Return the spotify playlist that matches the `src_pl_id`.
+
+        Args:
+            `src_pl_id`: The ID of a playlist to find, or None for the "Liked Songs" playlist.
+        """
+        src_pl = self._liked if src_pl_id is None else self._by_id.get(src_pl_id)
+        if src_pl is None:
+            raise ValueError(f"Could not find Spotify playlist {src_pl_id}")
+        return src_pl
+
+    def track_count(self, src_pl: Dict) -> int:
+        return len(src_pl["tracks"])
+
+
+def load_spotify_backup(
+    filename: str = "playlists.json", encoding: str = "utf-8"
+) -> Union[SpotifyBackup, BackupDB]:
+    """Load a Spotify backup, either a `playlists.json` or a SQLite backup.
+
+    The format is detected from the contents of the file, not its name.
+    """
+    if is_backup_db(filename):
+        return BackupDB(filename, is_reversed(filename))
+    return SpotifyBackup.load(filename, encoding)
 
 
 def create_playlist(pl_name: str, privacy_status: str = "PRIVATE") -> None:
@@ -102,14 +215,26 @@ def create_playlist(pl_name: str, privacy_status: str = "PRIVATE") -> None:
 def iter_spotify_liked_albums(
     spotify_playlist_file: str = "playlists.json",
     spotify_encoding: str = "utf-8",
+    backup: Optional[Union[SpotifyBackup, BackupDB]] = None,
 ) -> Iterator[SongInfo]:
-    """Songs from liked albums on Spotify."""
-    spotify_pls = load_playlists_json(spotify_playlist_file, spotify_encoding)
-
-    if "albums" not in spotify_pls:
-        return None
+    """Songs from liked albums on Spotify.
 
-    for album in [x["album"] for x in spotify_pls["albums"]]:
+    If an already loaded `backup` is not given, the albums are streamed from the
+    backup file one at a time.
+    """
+    if backup is None and is_backup_db(spotify_playlist_file):
+        backup = BackupDB(spotify_playlist_file)
+    if isinstance(backup, BackupDB):
+        for title, artist, album_name in backup.iter_album_tracks():
+            yield SongInfo(title, artist, album_name)
+        return
+
+    if backup is None:
+        albums = iter_playlists_json("albums", spotify_playlist_file, spotify_encoding)
+    else:
+        albums = iter(backup.albums)
+
+    for album in (x["album"] for x in albums):
         for track in album["tracks"]["items"]:
             yield SongInfo(track["name"], track["artists"][0]["name"], album["name"])
 
@@ -119,6 +244,7 @@ def iter_spotify_playlist(
     spotify_playlist_file: str = "playlists.json",
     spotify_encoding: str = "utf-8",
     reverse_playlist: bool = True,
+    backup: Optional[Union[SpotifyBackup, BackupDB]] = None,
 ) -> Iterator[SongInfo]:
     """Songs from a specific album ("Liked Songs" if None)
 
@@ -127,27 +253,52 @@ def iter_spotify_playlist(
         `spotify_playlist_file` (str, optional): The path to the playlists backup files. Defaults to "playlists.json".
         `spotify_encoding` (str, optional): Characters encoding. Defaults to "utf-8".
         `reverse_playlist` (bool, optional): Is the playlist reversed when loading?  Defaults to True.
+        `backup` (Optional[SpotifyBackup], optional): An already loaded backup, the file is not read if given.
+
+    Without a `backup`, the file is streamed and only the matching playlist is kept in
+    memory.  A SQLite backup is read directly, one track at a time.
+
+    If the backup has been marked as reversed (by `reverse_playlist`), the order is
+    flipped once more as the tracks are read.
 
     Yields:
         Iterator[SongInfo]: The song's information
     """
-    spotify_pls = load_playlists_json(spotify_playlist_file, spotify_encoding)
-
-    def find_spotify_playlist(spotify_pls: Dict, src_pl_id: Union[str, None]) -> Dict:
-        """Return the spotify playlist that matches the `src_pl_id`.
-
-        Args:
-            `spotify_pls`: The playlist datastrcuture saved by spotify-backup.
-            `src_pl_id`: The ID of a playlist to find, or None for the "Liked Songs" playlist.
-        """
-        for src_pl in spotify_pls["playlists"]:
-            if src_pl_id is None and str(src_pl.get("name")) == "Liked Songs":
-                return src_pl
-            if src_pl_id is not None and str(src_pl.get("id")) == src_pl_id:
-                return src_pl
-        raise ValueError(f"Could not find Spotify playlist {src_pl_id}")
-
-    src_pl = find_spotify_playlist(spotify_pls, src_pl_id)
+    if backup is None:
+        if is_backup_db(spotify_playlist_file):
+            backup = BackupDB(spotify_playlist_file, is_reversed(spotify_playlist_file))
+        elif is_reversed(spotify_playlist_file):
+            reverse_playlist = not reverse_playlist
+    if backup is not None and backup.tracks_reversed:
+        reverse_playlist = not reverse_playlist
+
+    if isinstance(backup, BackupDB):
+        src_pl = backup.find_playlist(src_pl_id)
+        print(f"== Spotify Playlist: {src_pl['name']}")
+        for title, artist, album in backup.iter_tracks(src_pl, reverse_playlist):
+            if title is None:
+                print(
+                    f"WARNING: Spotify track seems to be malformed, Skipping.  Track: {(title, artist, album)!r}"
+                )
+                continue
+            yield SongInfo(title, artist, album)
+        return
+
+    if backup is not None:
+        src_pl = backup.find_playlist(src_pl_id)
+    else:
+        src_pl = next(
+            (
+                pl
+                for pl in iter_playlists_json(
+                    "playlists", spotify_playlist_file, spotify_encoding
+                )
+                if _is_spotify_playlist(pl, src_pl_id)
+            ),
+            None,
+        )
+        if src_pl is None:
+            raise ValueError(f"Could not find Spotify playlist {src_pl_id}")
     src_pl_name = src_pl["name"]
 
     print(f"== Spotify Playlist: {src_pl_name}")
@@ -174,41 +325,169 @@ def iter_spotify_playlist(
         yield SongInfo(src_track_name, src_track_artist, src_album_name)
 
 
-def get_playlist_id_by_name(yt: YTMusic, title: str) -> Optional[str]:
+class PlaylistIndex:
+    """Index of the playlists in the YTMusic library, by title.
+
+    The library is listed (one `get_library_playlists` call) the first time the index
+    is used and then re-used for the rest of the run.  Playlists created during the run
+    should be recorded with `add()` (`_ytmusic_create_playlist` does this).
+    """
+
+    def __init__(self, yt: YTMusic):
+        self.yt = yt
+        self._playlists: Optional[List[dict]] = None
+        self._ids: Dict[str, str] = {}
+
+    def _load(self) -> List[dict]:
+        if self._playlists is not None:
+            return self._playlists
+
+        #  ytmusicapi seems to run into some situations where it gives a Traceback on listing playlists
+        #  https://github.com/sigma67/ytmusicapi/issues/539
+        try:
+            playlists = self.yt.get_library_playlists(limit=5000)
+        except KeyError as e:
+            print("=" * 60)
+            print(f"Attempting to list YTMusic playlists failed with KeyError: {e}")
+            print(
+                "This is a bug in ytmusicapi that prevents 'copy_all_playlists' from working."
+            )
+            print(
+                "You will need to manually copy playlists using s2yt_list_playlists and s2yt_copy_playlist"
+            )
+            print(
+                "until this bug gets resolved.  Try `pip install --upgrade ytmusicapi` just to verify"
+            )
+            print("you have the latest version of that library.")
+            print("=" * 60)
+            raise
+
+        self._playlists = list(playlists)
+        for pl in self._playlists:
+            self._ids.setdefault(pl["title"], pl["playlistId"])
+        return self._playlists
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self._load())
+
+    def get_id(self, title: str) -> Optional[str]:
+        """The ID of the (first) playlist named `title`, or None if there is none."""
+        self._load()
+        return self._ids.get(title)
+
+    def add(self, title: str, playlist_id: str) -> None:
+        """Record a playlist created after the library was listed."""
+        self._load()
+        self._playlists.append({"title": title, "playlistId": playlist_id, "count": 0})
+        self._ids.setdefault(title, playlist_id)
+
+
+def get_playlist_id_by_name(
+    yt: YTMusic, title: str, playlist_index: Optional[PlaylistIndex] = None
+) -> Optional[str]:
     """Look up a YTMusic playlist ID by name.
 
     Args:
         `yt` (YTMusic): _description_
         `title` (str): _description_
+        `playlist_index` (PlaylistIndex, optional): Index to look the name up in, rather than listing the library again.
 
     Returns:
         Optional[str]: The playlist ID or None if not found.
     """
-    #  ytmusicapi seems to run into some situations where it gives a Traceback on listing playlists
-    #  https://github.com/sigma67/ytmusicapi/issues/539
-    try:
-        playlists = yt.get_library_playlists(limit=5000)
-    except KeyError as e:
-        print("=" * 60)
-        print(f"Attempting to look up playlist '{title}' failed with KeyError: {e}")
-        print(
-            "This is a bug in ytmusicapi that prevents 'copy_all_playlists' from working."
-        )
-        print(
-            "You will need to manually copy playlists using s2yt_list_playlists and s2yt_copy_playlist"
-        )
-        print(
-            "until this bug gets resolved.  Try `pip install --upgrade ytmusicapi` just to verify"
-        )
-        print("you have the latest version of that library.")
-        print("=" * 60)
-        raise
+    if playlist_index is None:
+        playlist_index = PlaylistIndex(yt)
+    return playlist_index.get_id(title)
 
-    for pl in playlists:
-        if pl["title"] == title:
-            return pl["playlistId"]
 
-    return None
+class AlbumIndex:
+    """Album tracklists resolved once per (artist, album) and matched locally.
+
+    `lookup_song` normally searches for "{album} by {artist}" and fetches up to three
+    albums for every track.  When tracks are copied album by album (liked albums, or
+    playlists with several tracks from one album) that is repeated for each track.  The
+    index does the album search and fetches once per (artist, album) and then matches
+    the remaining tracks of that album against the fetched tracklists.
+
+    Only the `max_albums` most recently used albums are kept.  The index may be shared
+    between threads, an album that several threads need at once is resolved by one
+    of them while the others wait for it.
+    """
+
+    def __init__(self, max_albums: int = 64):
+        self.max_albums = max_albums
+        self.albums_resolved = 0
+        self.tracks_matched = 0
+        self._albums: "OrderedDict[tuple, Dict[str, dict]]" = OrderedDict()
+        self._pending: Dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+
+    def _resolve(
+        self, yt: YTMusic, artist_name: str, album_name: str
+    ) -> Tuple[Dict[str, dict], bool]:
+        """Return the tracks of the first 3 album hits, by title (first hit wins).
+
+        Also returns whether all the lookups succeeded, an incomplete result should
+        not be cached.
+        """
+        tracks: Dict[str, dict] = {}
+        try:
+            albums = yt.search(query=f"{album_name} by {artist_name}", filter="albums")
+        except Exception as e:
+            print(f"Unable to search for album ({e}), continuing...")
+            return tracks, False
+
+        complete = True
+        for album in albums[:3]:
+            try:
+                for track in yt.get_album(album["browseId"])["tracks"]:
+                    tracks.setdefault(track["title"], track)
+            except Exception as e:
+                print(f"Unable to lookup album ({e}), continuing...")
+                complete = False
+        return tracks, complete
+
+    def find(
+        self, yt: YTMusic, track_name: str, artist_name: str, album_name: str
+    ) -> Optional[dict]:
+        """Return the album track matching `track_name`, or None."""
+        key = (artist_name, album_name)
+        resolving = None
+        with self._lock:
+            tracks = self._albums.get(key)
+            if tracks is not None:
+                self._albums.move_to_end(key)
+            else:
+                #  Only one thread resolves an album, the others wait for its result
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = resolving = self._pending[key] = Future()
+
+        if tracks is None and resolving is None:
+            tracks = pending.result()
+        elif tracks is None:
+            try:
+                tracks, complete = self._resolve(yt, artist_name, album_name)
+            except BaseException as e:
+                with self._lock:
+                    del self._pending[key]
+                resolving.set_exception(e)
+                raise
+            with self._lock:
+                self.albums_resolved += 1
+                del self._pending[key]
+                #  After a failed lookup, the album is tried again for its next track
+                if complete:
+                    self._albums[key] = tracks
+                    while len(self._albums) > self.max_albums:
+                        self._albums.popitem(last=False)
+            resolving.set_result(tracks)
+
+        track = tracks.get(track_name)
+        if track is not None:
+            with self._lock:
+                self.tracks_matched += 1
+        return track
 
 
 @dataclass
@@ -225,6 +504,9 @@ def lookup_song(
     album_name,
     yt_search_algo: int,
     details: Optional[ResearchDetails] = None,
+    *,
+    match_cache: Optional[MatchCache] = None,
+    album_index: Optional[AlbumIndex] = None,
 ) -> dict:
     """Look up a song on YTMusic
 
@@ -246,6 +528,8 @@ def lookup_song(
         `album_name` (str): The name of the researched track's album
         `yt_search_algo` (int): 0 for exact matching, 1 for extended matching (search past 1st result), 2 for approximate matching (search in videos)
         `details` (ResearchDetails): If specified, more information about the search and the response will be populated for use by the caller.
+        `match_cache` (MatchCache): If specified, a previous match is returned from the cache without any YTMusic calls, and new matches are written to it.
+        `album_index` (AlbumIndex): If specified, the album lookup is done through the index so that it is only done once per album.
 
     Raises:
         ValueError: If no track is found, it returns an error
@@ -253,18 +537,68 @@ def lookup_song(
     Returns:
         dict: The infos of the researched song
     """
-    albums = yt.search(query=f"{album_name} by {artist_name}", filter="albums")
-    for album in albums[:3]:
-        # print(album)
-        # print(f"ALBUM: {album['browseId']} - {album['title']} - {album['artists'][0]['name']}")
+    if match_cache is None:
+        return _lookup_song(
+            yt,
+            track_name,
+            artist_name,
+            album_name,
+            yt_search_algo,
+            details,
+            album_index,
+        )
 
+    #  The cache only saves lookups, a track is still matched if it can't be used
+    key = make_key(track_name, artist_name, album_name, yt_search_algo)
+    try:
+        song = match_cache.get(key)
+    except sqlite3.Error as e:
+        print(f"WARNING: Unable to read the match cache ({e}), continuing...")
+        song = None
+    if song is None:
+        song = _lookup_song(
+            yt,
+            track_name,
+            artist_name,
+            album_name,
+            yt_search_algo,
+            details,
+            album_index,
+        )
         try:
-            for track in yt.get_album(album["browseId"])["tracks"]:
-                if track["title"] == track_name:
-                    return track
-            # print(f"{track['videoId']} - {track['title']} - {track['artists'][0]['name']}")
-        except Exception as e:
-            print(f"Unable to lookup album ({e}), continuing...")
+            match_cache.put(key, song)
+        except sqlite3.Error as e:
+            print(f"WARNING: Unable to write the match cache ({e}), continuing...")
+    return song
+
+
+def _lookup_song(
+    yt: YTMusic,
+    track_name: str,
+    artist_name: str,
+    album_name,
+    yt_search_algo: int,
+    details: Optional[ResearchDetails] = None,
+    album_index: Optional[AlbumIndex] = None,
+) -> dict:
+    """Uncached implementation of `lookup_song`."""
+    if album_index is not None:
+        track = album_index.find(yt, track_name, artist_name, album_name)
+        if track is not None:
+            return track
+    else:
+        albums = yt.search(query=f"{album_name} by {artist_name}", filter="albums")
+        for album in albums[:3]:
+            # print(album)
+            # print(f"ALBUM: {album['browseId']} - {album['title']} - {album['artists'][0]['name']}")
+
+            try:
+                for track in yt.get_album(album["browseId"])["tracks"]:
+                    if track["title"] == track_name:
+                        return track
+                # print(f"{track['videoId']} - {track['title']} - {track['artists'][0]['name']}")
+            except Exception as e:
+                print(f"Unable to lookup album ({e}), continuing...")
 
     query = f"{track_name} by {artist_name}"
     if details:
@@ -330,8 +664,7 @@ def lookup_song(
                         "title"
                     ].lower()  # People sometimes mess up the capitalization in the title
                     if (
-                        track_name in new_song_title
-                        and artist_name in new_song_title
+                        track_name in new_song_title and artist_name in new_song_title
                     ) or (track_name in new_song_title):
                         print("Found a video")
                         return new_song
@@ -344,24 +677,272 @@ def lookup_song(
                 return songs[0]
 
 
+def _add_succeeded(response) -> bool:
+    """Did an `add_playlist_items` call succeed?
+
+    Rather than raising, YTMusic returns a non-SUCCEEDED status if the items could not
+    be added, for example because one of them is already in the playlist.
+    """
+    if not isinstance(response, dict):
+        return True
+    return "SUCCEEDED" in str(response.get("status", ""))
+
+
+class PlaylistWriter:
+    """Add videoIds to a YTMusic playlist in batches.
+
+    `add()` buffers the videoIds and they are added `batch_size` at a time, `flush()`
+    adds whatever is left over (use the writer as a context manager to flush on exit).
+
+    Adds that fail with a transient error (throttling, server errors, timeouts) are
+    retried with back-off (see `RateLimiter.retry`), the videoIds of a batch that
+    still can't be added are recorded in `failed`.  If YTMusic rejects a batch (a
+    non-SUCCEEDED status or an error in `NON_RETRYABLE`), it is split in half and each
+    half is retried, down to single videoIds, so that one bad (or already present)
+    videoId does not fail the whole batch.  A single videoId that YTMusic answers with
+    a non-SUCCEEDED status (it is usually already in the playlist) is recorded in
+    `rejected`.
+
+    Each videoId may be given a `token`, `on_added` is called with the tokens of the
+    videoIds that were added after each successful add, `on_rejected` with the token
+    of each rejected videoId.
+    """
+
+    def __init__(
+        self,
+        yt: YTMusic,
+        playlist_id: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        on_added: Optional[Callable[[List[Any]], None]] = None,
+        on_rejected: Optional[Callable[[List[Any]], None]] = None,
+    ):
+        self.yt = yt
+        self.playlist_id = playlist_id
+        self.batch_size = max(1, batch_size)
+        self.on_added = on_added
+        self.on_rejected = on_rejected
+        self.added = 0
+        self.calls = 0
+        self.failed: List[str] = []
+        self.rejected: List[str] = []
+        self._buffer: List[Tuple[str, Any]] = []
+
+    def __enter__(self) -> "PlaylistWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.flush()
+
+    def add(self, video_id: str, token: Any = None) -> None:
+        self._buffer.append((video_id, token))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        batch, self._buffer = self._buffer, []
+        if batch:
+            self._add_batch(batch)
+
+    def _added(self, batch: List[Tuple[str, Any]]) -> None:
+        self.added += len(batch)
+        if self.on_added is not None:
+            self.on_added([token for _, token in batch])
+
+    def _add_items(self, video_ids: List[str]):
+        def add():
+            self.calls += 1
+            return self.yt.add_playlist_items(
+                playlistId=self.playlist_id, videoIds=video_ids, duplicates=False
+            )
+
+        tracks = video_ids[0] if len(video_ids) == 1 else f"{len(video_ids)} tracks"
+        return get_limiter("ytmusic").retry(
+            add, f"add_playlist_items: {self.playlist_id} {tracks}"
+        )
+
+    def _add_batch(self, batch: List[Tuple[str, Any]]) -> None:
+        if len(batch) == 1:
+            self._add_one(batch)
+            return
+
+        video_ids = [video_id for video_id, _ in batch]
+        try:
+            response = self._add_items(video_ids)
+        except NON_RETRYABLE as e:
+            error = str(e)
+        except Exception as e:
+            #  Still failing after the retries: smaller batches would fail the same way
+            print(
+                f"ERROR: Unable to add {len(batch)} tracks to {self.playlist_id}: {e}"
+            )
+            self.failed.extend(video_ids)
+            return
+        else:
+            if _add_succeeded(response):
+                self._added(batch)
+                return
+            error = f"status {response.get('status')}"
+
+        print(
+            f"WARNING: Adding {len(batch)} tracks to {self.playlist_id} failed ({error}), splitting batch"
+        )
+        middle = len(batch) // 2
+        self._add_batch(batch[:middle])
+        self._add_batch(batch[middle:])
+
+    def _add_one(self, batch: List[Tuple[str, Any]]) -> None:
+        video_id = batch[0][0]
+        try:
+            response = self._add_items([video_id])
+        except Exception as e:
+            print(f"ERROR: Unable to add {video_id} to {self.playlist_id}: {e}")
+            self.failed.append(video_id)
+            return
+
+        if _add_succeeded(response):
+            self._added(batch)
+        else:
+            print(
+                f"WARNING: {video_id} was not added to {self.playlist_id}, it may already be in the playlist"
+            )
+            self.rejected.append(video_id)
+            if self.on_rejected is not None:
+                self.on_rejected([batch[0][1]])
+
+
+def imap_ordered(
+    func: Callable[[T], R], items: Iterable[T], workers: int = 1
+) -> Iterator[Tuple[T, R]]:
+    """Yield `(item, func(item))` for each item, in the original order.
+
+    With `workers` > 1 the calls are run in a thread pool, with a bounded number of
+    calls in flight so that a long (or lazily generated) source is not read ahead
+    without limit.  Results are still yielded strictly in source order, so the caller
+    can consume them as if the calls were done serially.
+    """
+    if workers <= 1:
+        for item in items:
+            yield item, func(item)
+        return
+
+    window = workers * 4
+    pending: Deque[Tuple[T, Future]] = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for item in items:
+            pending.append((item, executor.submit(func, item)))
+            if len(pending) >= window:
+                item, future = pending.popleft()
+                yield item, future.result()
+        while pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+
+
+_PREFETCH_DONE = object()
+
+
+def prefetch(items: Iterable[T], depth: int = 2) -> Iterator[T]:
+    """Yield the items of `items`, producing up to `depth` of them ahead in a thread.
+
+    For a source that is slow to produce, such as pages fetched from an API, the next
+    items are produced while the caller is still working on the current one, and at
+    most `depth` of them are held in memory.  An exception raised by the source is
+    re-raised to the caller once the items before it have been yielded.  If the caller
+    stops early, the thread stops without producing any more items.
+    """
+    buffer: "queue.Queue" = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def put(entry) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+        except Exception as e:
+            put((_PREFETCH_DONE, e))
+            return
+        put((_PREFETCH_DONE, None))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is _PREFETCH_DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
 def copier(
     src_tracks: Iterator[SongInfo],
     dst_pl_id: Optional[str] = None,
     dry_run: bool = False,
-    track_sleep: float = 0.1,
+    track_sleep: float = 0,
     yt_search_algo: int = 0,
     *,
     yt: Optional[YTMusic] = None,
+    match_cache: Optional[MatchCache] = None,
+    group_albums: bool = False,
+    workers: int = 1,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    journal: Optional[CopyJournal] = None,
+    incremental: bool = False,
 ):
     """
     @@@
+
+    If `group_albums` is set, the album lookup is done once per (artist, album) and the
+    tracks of that album are matched against the fetched tracklist, only falling back to
+    a per-track song search for tracks not found on the album.  This is much cheaper
+    when copying whole albums, such as the liked albums.
+
+    With `workers` > 1, songs are looked up concurrently by that many threads, while
+    the results are still added to the destination playlist one at a time in the
+    original source order.
+
+    Songs are added to the destination playlist `batch_size` at a time.
+
+    If a `journal` is given, each resolved and committed track is recorded in it.
+    Tracks the journal (opened with `resume`) shows as already committed are skipped,
+    and tracks it shows as resolved are added without looking them up again.
+
+    With `incremental`, the videoIds already in the destination playlist are fetched
+    once.  Source tracks whose match is already known (from the match cache or the
+    journal) and already in the playlist are skipped without a lookup, and looked up
+    tracks that are already in the playlist are not added again, so only the
+    difference is copied.
     """
+    response_cache = None
     if yt is None:
-        yt = get_ytmusic()
+        yt = response_cache = CachingYTMusic(get_ytmusic())
 
+    album_index = AlbumIndex() if group_albums else None
+
+    existing_video_ids = set()
     if dst_pl_id is not None:
         try:
-            yt_pl = yt.get_playlist(playlistId=dst_pl_id)
+            if incremental:
+                yt_pl = yt.get_playlist(playlistId=dst_pl_id, limit=None)
+                existing_video_ids = {
+                    track["videoId"]
+                    for track in yt_pl.get("tracks", [])
+                    if track.get("videoId")
+                }
+            else:
+                yt_pl = yt.get_playlist(playlistId=dst_pl_id)
         except Exception as e:
             print(f"ERROR: Unable to find YTMusic playlist {dst_pl_id}: {e}")
             print(
@@ -370,62 +951,190 @@ def copier(
             print("      'PL_DhcdsaJ7echjfdsaJFhdsWUd73HJFca'")
             sys.exit(1)
         print(f"== Youtube Playlist: {yt_pl['title']}")
+        if incremental:
+            print(f"   {len(existing_video_ids)} tracks already in the playlist")
 
     tracks_added_set = set()
     duplicate_count = 0
     error_count = 0
-
-    for src_track in src_tracks:
-        print(f"Spotify:   {src_track.title} - {src_track.artist} - {src_track.album}")
-
+    resumed_count = 0
+    present_count = 0
+
+    if journal is not None:
+        tracks_added_set.update(journal.committed_video_ids())
+
+    def lookup(
+        item: Tuple[int, SongInfo]
+    ) -> Tuple[Optional[dict], Optional[Exception]]:
+        position, src_track = item
+        if journal is not None:
+            song = journal.resolved_song(position, src_track)
+            if song is not None:
+                return song, None
         try:
             dst_track = lookup_song(
-                yt, src_track.title, src_track.artist, src_track.album, yt_search_algo
+                yt,
+                src_track.title,
+                src_track.artist,
+                src_track.album,
+                yt_search_algo,
+                match_cache=match_cache,
+                album_index=album_index,
             )
         except Exception as e:
-            print(f"ERROR: Unable to look up song on YTMusic: {e}")
-            error_count += 1
-            continue
+            return None, e
+        return dst_track, None
+
+    def known_video_id(position: int, src_track: SongInfo) -> Optional[str]:
+        """The videoId `src_track` is known to match, without any YTMusic calls."""
+        song = None
+        if journal is not None:
+            song = journal.resolved_song(position, src_track)
+        if song is None and match_cache is not None:
+            song = match_cache.peek(
+                make_key(
+                    src_track.title, src_track.artist, src_track.album, yt_search_algo
+                )
+            )
+        return None if song is None else song.get("videoId")
+
+    def pending_tracks() -> Iterator[Tuple[int, SongInfo]]:
+        nonlocal resumed_count, present_count
+        for position, src_track in enumerate(src_tracks):
+            if journal is not None and journal.is_committed(position, src_track):
+                resumed_count += 1
+                continue
+            if (
+                existing_video_ids
+                and known_video_id(position, src_track) in existing_video_ids
+            ):
+                present_count += 1
+                continue
+            yield position, src_track
 
-        yt_artist_name = "<Unknown>"
-        if "artists" in dst_track and len(dst_track["artists"]) > 0:
-            yt_artist_name = dst_track["artists"][0]["name"]
-        print(
-            f"  Youtube: {dst_track['title']} - {yt_artist_name} - {dst_track['album'] if 'album' in dst_track else '<Unknown>'}"
+    writer = None
+    if dst_pl_id is not None and not dry_run:
+        writer = PlaylistWriter(
+            yt,
+            dst_pl_id,
+            batch_size,
+            on_added=journal.record_committed if journal is not None else None,
+            #  Retrying a rejected track on resume would only get it rejected again
+            on_rejected=journal.record_committed if journal is not None else None,
         )
 
-        if dst_track["videoId"] in tracks_added_set:
-            print("(DUPLICATE, this track has already been added)")
-            duplicate_count += 1
-        tracks_added_set.add(dst_track["videoId"])
-
-        if not dry_run:
-            exception_sleep = 5
-            for _ in range(10):
-                try:
-                    if dst_pl_id is not None:
-                        yt.add_playlist_items(
-                            playlistId=dst_pl_id,
-                            videoIds=[dst_track["videoId"]],
-                            duplicates=False,
+    try:
+        for (position, src_track), (dst_track, lookup_error) in imap_ordered(
+            lookup, pending_tracks(), workers
+        ):
+            print(
+                f"Spotify:   {src_track.title} - {src_track.artist} - {src_track.album}"
+            )
+
+            if lookup_error is not None:
+                print(f"ERROR: Unable to look up song on YTMusic: {lookup_error}")
+                error_count += 1
+                continue
+
+            if journal is not None:
+                journal.record_resolved(position, src_track, dst_track)
+
+            if dst_track["videoId"] in existing_video_ids:
+                print("(Already in the playlist)")
+                present_count += 1
+                continue
+
+            yt_artist_name = "<Unknown>"
+            if "artists" in dst_track and len(dst_track["artists"]) > 0:
+                yt_artist_name = dst_track["artists"][0]["name"]
+            print(
+                f"  Youtube: {dst_track['title']} - {yt_artist_name} - {dst_track['album'] if 'album' in dst_track else '<Unknown>'}"
+            )
+
+            is_duplicate = dst_track["videoId"] in tracks_added_set
+            if is_duplicate:
+                print("(DUPLICATE, this track has already been added)")
+                duplicate_count += 1
+            tracks_added_set.add(dst_track["videoId"])
+
+            if not dry_run:
+                if writer is not None:
+                    #  Duplicates would be rejected by YTMusic, and fail the whole batch
+                    if is_duplicate:
+                        if journal is not None:
+                            journal.record_committed([(position, src_track)])
+                    else:
+                        writer.add(dst_track["videoId"], (position, src_track))
+                else:
+                    try:
+                        get_limiter("ytmusic").retry(
+                            lambda: yt.rate_song(dst_track["videoId"], "LIKE"),
+                            f"rate_song: {dst_track['videoId']}",
                         )
+                    except Exception as e:
+                        print(f"ERROR: Unable to like {dst_track['videoId']}: {e}")
+                        error_count += 1
                     else:
-                        yt.rate_song(dst_track["videoId"], "LIKE")
-                    break
-                except Exception as e:
-                    print(
-                        f"ERROR: (Retrying add_playlist_items: {dst_pl_id} {dst_track['videoId']}) {e} in {exception_sleep} seconds"
-                    )
-                    time.sleep(exception_sleep)
-                    exception_sleep *= 2
+                        if journal is not None:
+                            journal.record_committed([(position, src_track)])
+
+            if track_sleep:
+                time.sleep(track_sleep)
+    finally:
+        if writer is not None:
+            writer.flush()
 
-        if track_sleep:
-            time.sleep(track_sleep)
+    if writer is not None:
+        error_count += len(writer.failed) + len(writer.rejected)
 
     print()
+    if resumed_count:
+        print(f"Skipped {resumed_count} tracks already copied by a previous run")
+    if present_count:
+        print(f"Skipped {present_count} tracks already in the destination playlist")
     print(
         f"Added {len(tracks_added_set)} tracks, encountered {duplicate_count} duplicates, {error_count} errors"
     )
+    if writer is not None:
+        print(
+            f"Playlist writes: {writer.added} tracks added in {writer.calls} add_playlist_items calls"
+        )
+    if match_cache is not None:
+        print(
+            f"Match cache: {match_cache.hits} hits, {match_cache.misses} misses ({match_cache.filename})"
+        )
+    if album_index is not None:
+        print(
+            f"Album lookups: {album_index.albums_resolved} albums resolved, {album_index.tracks_matched} tracks matched on albums"
+        )
+    if response_cache is not None:
+        response_cache.print_stats()
+        print(f"Rate limiter {get_limiter('ytmusic').stats()}")
+
+
+def _spotify_playlist_name(
+    src_pl_id: str,
+    encoding: str = "utf-8",
+    backup: Optional[Union[SpotifyBackup, BackupDB]] = None,
+    filename: str = "playlists.json",
+) -> str:
+    """The name of Spotify playlist `src_pl_id`, "" if it is not in the backup.
+
+    Without a `backup`, the file is streamed rather than loaded.
+    """
+    if backup is None and is_backup_db(filename):
+        with BackupDB(filename) as db:
+            return _spotify_playlist_name(src_pl_id, backup=db)
+
+    if backup is not None:
+        playlists: Iterable[Dict] = backup.playlists
+    else:
+        playlists = iter_playlists_json("playlists", filename, encoding)
+    pl_name = ""
+    for pl in playlists:
+        if len(pl.keys()) > 3 and pl["id"] == src_pl_id:
+            pl_name = pl["name"]
+    return pl_name
 
 
 def copy_playlist(
@@ -433,38 +1142,58 @@ def copy_playlist(
     ytmusic_playlist_id: str,
     spotify_playlists_encoding: str = "utf-8",
     dry_run: bool = False,
-    track_sleep: float = 0.1,
+    track_sleep: float = 0,
     yt_search_algo: int = 0,
     reverse_playlist: bool = True,
     privacy_status: str = "PRIVATE",
+    match_cache: Optional[MatchCache] = None,
+    group_albums: bool = False,
+    workers: int = 1,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    resume: bool = False,
+    incremental: bool = False,
+    playlist_index: Optional[PlaylistIndex] = None,
+    backup: Optional[Union[SpotifyBackup, BackupDB]] = None,
 ):
     """
     Copy a Spotify playlist to a YTMusic playlist
     @@@
+
+    Progress is recorded in a `CopyJournal`, with `resume` the tracks an interrupted
+    earlier copy already added are skipped without any YTMusic calls.
+
+    With `incremental`, only the source tracks that are not already in the destination
+    playlist are copied (see `copier`).
+
+    A `playlist_index` of the YTMusic library, and a loaded Spotify `backup`, may be
+    passed in to avoid listing the library or parsing `playlists.json` again.  Without
+    a `backup`, `playlists.json` is streamed, only holding one playlist in memory.
     """
     print("Using search algo n°: ", yt_search_algo)
-    yt = get_ytmusic()
+    yt = CachingYTMusic(get_ytmusic())
+    if playlist_index is None:
+        playlist_index = PlaylistIndex(yt)
     pl_name: str = ""
 
     if ytmusic_playlist_id.startswith("+"):
         pl_name = ytmusic_playlist_id[1:]
 
-        ytmusic_playlist_id = get_playlist_id_by_name(yt, pl_name)
+        ytmusic_playlist_id = playlist_index.get_id(pl_name)
         print(f"Looking up playlist '{pl_name}': id={ytmusic_playlist_id}")
 
     if ytmusic_playlist_id is None:
         if pl_name == "":
             print("No playlist name or ID provided, creating playlist...")
-            spotify_pls: dict = load_playlists_json()
-            for pl in spotify_pls["playlists"]:
-                if len(pl.keys()) > 3 and pl["id"] == spotify_playlist_id:
-                    pl_name = pl["name"]
+            pl_name = _spotify_playlist_name(
+                spotify_playlist_id, spotify_playlists_encoding, backup
+            )
 
         ytmusic_playlist_id = _ytmusic_create_playlist(
             yt,
             title=pl_name,
             description=pl_name,
             privacy_status=privacy_status,
+            playlist_index=playlist_index,
         )
 
         #  create_playlist returns a dict if there was an error
@@ -473,35 +1202,56 @@ def copy_playlist(
             sys.exit(1)
         print(f"NOTE: Created playlist '{pl_name}' with ID: {ytmusic_playlist_id}")
 
-    copier(
-        iter_spotify_playlist(
-            spotify_playlist_id,
-            spotify_encoding=spotify_playlists_encoding,
-            reverse_playlist=reverse_playlist,
-        ),
-        ytmusic_playlist_id,
-        dry_run,
-        track_sleep,
-        yt_search_algo,
-        yt=yt,
-    )
+    with CopyJournal(spotify_playlist_id, ytmusic_playlist_id, resume) as journal:
+        copier(
+            iter_spotify_playlist(
+                spotify_playlist_id,
+                spotify_encoding=spotify_playlists_encoding,
+                reverse_playlist=reverse_playlist,
+                backup=backup,
+            ),
+            ytmusic_playlist_id,
+            dry_run,
+            track_sleep,
+            yt_search_algo,
+            yt=yt,
+            match_cache=match_cache,
+            group_albums=group_albums,
+            workers=workers,
+            batch_size=batch_size,
+            journal=journal,
+            incremental=incremental,
+        )
+    yt.print_stats()
+    print(f"Rate limiter {get_limiter('ytmusic').stats()}")
 
 
 def copy_all_playlists(
-    track_sleep: float = 0.1,
+    track_sleep: float = 0,
     dry_run: bool = False,
     spotify_playlists_encoding: str = "utf-8",
     yt_search_algo: int = 0,
     reverse_playlist: bool = True,
     privacy_status: str = "PRIVATE",
+    match_cache: Optional[MatchCache] = None,
+    group_albums: bool = False,
+    workers: int = 1,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    resume: bool = False,
+    incremental: bool = False,
 ):
     """
     Copy all Spotify playlists (except Liked Songs) to YTMusic playlists
+
+    With `resume`, tracks already added by an interrupted earlier run are skipped, and
+    with `incremental` only tracks missing from existing playlists are copied (see
+    `copy_playlist`).
     """
-    spotify_pls = load_playlists_json()
-    yt = get_ytmusic()
+    backup = load_spotify_backup(encoding=spotify_playlists_encoding)
+    yt = CachingYTMusic(get_ytmusic())
+    playlist_index = PlaylistIndex(yt)
 
-    for src_pl in spotify_pls["playlists"]:
+    for src_pl in backup.playlists:
         if str(src_pl.get("name")) == "Liked Songs":
             continue
 
@@ -509,11 +1259,15 @@ def copy_all_playlists(
         if pl_name == "":
             pl_name = f"Unnamed Spotify Playlist {src_pl['id']}"
 
-        dst_pl_id = get_playlist_id_by_name(yt, pl_name)
+        dst_pl_id = playlist_index.get_id(pl_name)
         print(f"Looking up playlist '{pl_name}': id={dst_pl_id}")
         if dst_pl_id is None:
             dst_pl_id = _ytmusic_create_playlist(
-                yt, title=pl_name, description=pl_name, privacy_status=privacy_status
+                yt,
+                title=pl_name,
+                description=pl_name,
+                privacy_status=privacy_status,
+                playlist_index=playlist_index,
             )
 
             #  create_playlist returns a dict if there was an error
@@ -522,17 +1276,27 @@ def copy_all_playlists(
                 sys.exit(1)
             print(f"NOTE: Created playlist '{pl_name}' with ID: {dst_pl_id}")
 
-        copier(
-            iter_spotify_playlist(
-                src_pl["id"],
-                spotify_encoding=spotify_playlists_encoding,
-                reverse_playlist=reverse_playlist,
-            ),
-            dst_pl_id,
-            dry_run,
-            track_sleep,
-            yt_search_algo,
-        )
+        with CopyJournal(src_pl["id"], dst_pl_id, resume) as journal:
+            copier(
+                iter_spotify_playlist(
+                    src_pl["id"],
+                    reverse_playlist=reverse_playlist,
+                    backup=backup,
+                ),
+                dst_pl_id,
+                dry_run,
+                track_sleep,
+                yt_search_algo,
+                yt=yt,
+                match_cache=match_cache,
+                group_albums=group_albums,
+                workers=workers,
+                batch_size=batch_size,
+                journal=journal,
+                incremental=incremental,
+            )
         print("\nPlaylist done!\n")
 
+    yt.print_stats()
+    print(f"Rate limiter {get_limiter('ytmusic').stats()}")
     print("All done!")
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import sqlite3
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+SQLITE_MAGIC = b"SQLite format 3\x00"
+
+SCHEMA = """
+CREATE TABLE playlists (
+    pos INTEGER PRIMARY KEY,
+    id TEXT,
+    name TEXT,
+    snapshot_id TEXT,
+    track_count INTEGER NOT NULL,
+    meta TEXT NOT NULL
+);
+CREATE INDEX playlists_id ON playlists (id);
+CREATE INDEX playlists_name ON playlists (name);
+CREATE TABLE tracks (
+    playlist INTEGER NOT NULL,
+    pos INTEGER NOT NULL,
+    name TEXT,
+    artist TEXT,
+    album TEXT,
+    uri TEXT,
+    added_at TEXT,
+    PRIMARY KEY (playlist, pos)
+) WITHOUT ROWID;
+CREATE TABLE albums (
+    pos INTEGER PRIMARY KEY,
+    id TEXT,
+    name TEXT,
+    artist TEXT,
+    added_at TEXT,
+    meta TEXT NOT NULL
+);
+CREATE TABLE album_tracks (
+    album INTEGER NOT NULL,
+    pos INTEGER NOT NULL,
+    name TEXT,
+    artist TEXT,
+    PRIMARY KEY (album, pos)
+) WITHOUT ROWID;
+"""
+
+#  (title, artist, album), any of which may be None for a malformed track
+TrackRow = Tuple[Optional[str], Optional[str], Optional[str]]
+
+
+def is_backup_db(filename: str) -> bool:
+    """Is `filename` a SQLite backup (rather than a `playlists.json`)?"""
+    try:
+        with open(filename, "rb") as f:
+            return f.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+    except OSError:
+        return False
+
+
+def _first_artist(item: Dict) -> Optional[str]:
+    artists = item.get("artists") or []
+    return artists[0].get("name") if artists else None
+
+
+def _without(item: Dict, key: str) -> Dict:
+    return {k: v for k, v in item.items() if k != key}
+
+
+def _track_row(pl_pos: int, pos: int, item: Dict) -> Tuple:
+    #  "track" is None for tracks that are no longer available
+    track = item.get("track") or {}
+    return (
+        pl_pos,
+        pos,
+        track.get("name"),
+        _first_artist(track),
+        (track.get("album") or {}).get("name"),
+        track.get("uri"),
+        item.get("added_at"),
+    )
+
+
+class BackupDBWriter:
+    """Writes a SQLite backup one playlist at a time, replacing `filename`.
+
+    Playlist and album metadata is kept as JSON, the tracks are stored as rows of
+    (name, first artist, album) so readers can fetch exactly the columns they need.
+    The data is committed by `close()`.
+    """
+
+    def __init__(self, filename: str):
+        if os.path.exists(filename):
+            os.remove(filename)
+        self._db = sqlite3.connect(filename)
+        self._db.executescript(SCHEMA)
+        self._playlists = 0
+        self._albums = 0
+
+    def add_playlist(self, playlist: Dict) -> None:
+        pl_pos = self._playlists
+        self._playlists += 1
+        tracks = playlist.get("tracks") or []
+        self._db.execute(
+            "INSERT INTO playlists VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                pl_pos,
+                playlist.get("id"),
+                playlist.get("name"),
+                playlist.get("snapshot_id"),
+                len(tracks),
+                json.dumps(_without(playlist, "tracks")),
+            ),
+        )
+        self._db.executemany(
+            "INSERT INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (_track_row(pl_pos, pos, item) for pos, item in enumerate(tracks)),
+        )
+
+    def add_albums(self, liked_albums: Iterable[Dict]) -> None:
+        for item in liked_albums:
+            album_pos = self._albums
+            self._albums += 1
+            album = item["album"]
+            self._db.execute(
+                "INSERT INTO albums VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    album_pos,
+                    album.get("id"),
+                    album.get("name"),
+                    _first_artist(album),
+                    item.get("added_at"),
+                    json.dumps(_without(album, "tracks")),
+                ),
+            )
+            self._db.executemany(
+                "INSERT INTO album_tracks VALUES (?, ?, ?, ?)",
+                (
+                    (album_pos, pos, track.get("name"), _first_artist(track))
+                    for pos, track in enumerate(album["tracks"]["items"])
+                ),
+            )
+
+    def close(self) -> None:
+        self._db.commit()
+        self._db.close()
+
+    def abort(self) -> None:
+        self._db.close()
+
+
+def write_backup_db(filename: str, playlists: List[Dict], liked_albums: List[Dict]):
+    """Write a backup as a SQLite database, replacing `filename` if it exists."""
+    writer = BackupDBWriter(filename)
+    try:
+        for playlist in playlists:
+            writer.add_playlist(playlist)
+        writer.add_albums(liked_albums)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+
+
+class BackupDB:
+    """Reader for a backup written by `write_backup_db`.
+
+    Playlists are found through the index on their ID, and tracks are read as
+    (name, artist, album) columns, so copying one playlist reads only that playlist.
+    `tracks_reversed` is set if the backup has been marked as reversed.
+    """
+
+    def __init__(self, filename: str, tracks_reversed: bool = False):
+        self.filename = filename
+        self.tracks_reversed = tracks_reversed
+        self._db = sqlite3.connect(f"file:{filename}?mode=ro", uri=True)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "BackupDB":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _playlist(self, row: Tuple) -> Dict:
+        pos, track_count, meta = row
+        playlist = json.loads(meta)
+        playlist["pos"] = pos
+        playlist["track_count"] = track_count
+        return playlist
+
+    @property
+    def playlists(self) -> List[Dict]:
+        """The playlists' metadata (without their tracks), in backup order."""
+        return [
+            self._playlist(row)
+            for row in self._db.execute(
+                "SELECT pos, track_count, meta FROM playlists ORDER BY pos"
+            )
+        ]
+
+    def find_playlist(self, src_pl_id: Optional[str]) -> Dict:
+        """Return the metadata of playlist `src_pl_id` (the "Liked Songs" if None)."""
+        if src_pl_id is None:
+            row = self._db.execute(
+                "SELECT pos, track_count, meta FROM playlists WHERE name = 'Liked Songs' "
+                "ORDER BY pos LIMIT 1"
+            ).fetchone()
+        else:
+            row = self._db.execute(
+                "SELECT pos, track_count, meta FROM playlists WHERE id = ? "
+                "ORDER BY pos LIMIT 1",
+                (src_pl_id,),
+            ).fetchone()
+        if row is None:
+            raise ValueError(f"Could not find Spotify playlist {src_pl_id}")
+        return self._playlist(row)
+
+    def track_count(self, src_pl: Dict) -> int:
+        return src_pl["track_count"]
+
+    def iter_tracks(self, src_pl: Dict, reverse: bool = False) -> Iterator[TrackRow]:
+        """The (name, artist, album) of the tracks of `src_pl`."""
+        order = "DESC" if reverse else "ASC"
+        return self._db.execute(
+            f"SELECT name, artist, album FROM tracks WHERE playlist = ? ORDER BY pos {order}",
+            (src_pl["pos"],),
+        )
+
+    def iter_album_tracks(self) -> Iterable[TrackRow]:
+        """The (name, artist, album) of the tracks of all liked albums."""
+        return self._db.execute(
+            "SELECT t.name, t.artist, a.name FROM album_tracks t "
+            "JOIN albums a ON a.pos = t.album ORDER BY t.album, t.pos"
+        )
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+import json
+import os
+from typing import Any, Dict
+
+
+def metadata_file(filename: str) -> str:
+    """The sidecar file holding the metadata of backup `filename`."""
+    return f"{filename}.meta.json"
+
+
+def load_metadata(filename: str) -> Dict[str, Any]:
+    """Load the metadata of backup `filename`, empty if it has none."""
+    try:
+        with open(metadata_file(filename), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_metadata(filename: str, metadata: Dict[str, Any]) -> None:
+    with open(metadata_file(filename), "w", encoding="utf-8") as f:
+        json.dump(metadata, f)
+
+
+def clear_metadata(filename: str) -> None:
+    """Remove the metadata of `filename`, for when the backup is replaced."""
+    try:
+        os.remove(metadata_file(filename))
+    except FileNotFoundError:
+        pass
+
+
+def is_reversed(filename: str) -> bool:
+    """Has the track order of the playlists in backup `filename` been reversed?
+
+    Rather than rewriting the backup, `reverse_playlist` records this flag, and the
+    readers in `backend` reverse the playlists as they read them.
+    """
+    return bool(load_metadata(filename).get("reversed", False))
@@ -1,10 +1,35 @@
 #!/usr/bin/env python3
 
 import sys
-from argparse import ArgumentParser
+import time
+from argparse import ArgumentParser, Namespace
 import pprint
+from typing import Optional
 
 from . import backend
+from .match_cache import MatchCache, DEFAULT_CACHE_FILE
+from .journal import CopyJournal
+
+
+def add_match_cache_arguments(parser: ArgumentParser) -> None:
+    """Add the match cache options shared by the copy commands."""
+    parser.add_argument(
+        "--match-cache",
+        default=DEFAULT_CACHE_FILE,
+        help=f"File to cache song matches in between runs (default: {DEFAULT_CACHE_FILE})",
+    )
+    parser.add_argument(
+        "--no-match-cache",
+        action="store_true",
+        help="Do not use the match cache, always look songs up on YTMusic.",
+    )
+
+
+def open_match_cache(args: Namespace) -> Optional[MatchCache]:
+    """Open the match cache selected by `add_match_cache_arguments` options."""
+    if args.no_match_cache:
+        return None
+    return MatchCache(args.match_cache)
 
 
 def list_liked_albums():
@@ -21,18 +46,18 @@ def list_playlists():
     """
     yt = backend.get_ytmusic()
 
-    spotify_pls = backend.load_playlists_json()
+    backup = backend.load_spotify_backup()
 
     #  Liked music
     print("== Spotify")
-    for src_pl in spotify_pls["playlists"]:
+    for src_pl in backup.playlists:
         print(
-            f"{src_pl.get('id')} - {src_pl['name']:50} ({len(src_pl['tracks'])} tracks)"
+            f"{src_pl.get('id')} - {src_pl['name']:50} ({backup.track_count(src_pl)} tracks)"
         )
 
     print()
     print("== YTMusic")
-    for pl in yt.get_library_playlists(limit=5000):
+    for pl in backend.PlaylistIndex(yt):
         print(f"{pl['playlistId']} - {pl['title']:40} ({pl.get('count', '?')} tracks)")
 
 
@@ -119,8 +144,9 @@ def load_liked_albums():
         parser.add_argument(
             "--track-sleep",
             type=float,
-            default=0.1,
-            help="Time to sleep between each track that is added (default: 0.1)",
+            default=0,
+            help="Extra time to sleep between each track that is added, requests are "
+            "already paced by an adaptive rate limiter (default: 0)",
         )
         parser.add_argument(
             "--dry-run",
@@ -139,21 +165,44 @@ def load_liked_albums():
             help="Algorithm to use for search (0 = exact, 1 = extended, 2 = approximate)",
         )
 
+        parser.add_argument(
+            "--no-group-albums",
+            action="store_true",
+            help="Search for the album of every track individually, rather than looking "
+            "up each album once and matching its tracks against it.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of songs to look up on YTMusic concurrently, songs are still "
+            "added in playlist order (default: 1)",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Skip the tracks that an interrupted previous run already copied.",
+        )
+        add_match_cache_arguments(parser)
+
         return parser.parse_args()
 
     args = parse_arguments()
 
-    spotify_pls = backend.load_playlists_json()
-
-    backend.copier(
-        backend.iter_spotify_liked_albums(
-            spotify_encoding=args.spotify_playlists_encoding
-        ),
-        None,
-        args.dry_run,
-        args.track_sleep,
-        args.algo,
-    )
+    with CopyJournal("liked_albums", "likes", args.resume) as journal:
+        backend.copier(
+            backend.iter_spotify_liked_albums(
+                spotify_encoding=args.spotify_playlists_encoding
+            ),
+            None,
+            args.dry_run,
+            args.track_sleep,
+            args.algo,
+            match_cache=open_match_cache(args),
+            group_albums=not args.no_group_albums,
+            workers=args.workers,
+            journal=journal,
+        )
 
 
 def load_liked():
@@ -166,8 +215,9 @@ def load_liked():
         parser.add_argument(
             "--track-sleep",
             type=float,
-            default=0.1,
-            help="Time to sleep between each track that is added (default: 0.1)",
+            default=0,
+            help="Extra time to sleep between each track that is added, requests are "
+            "already paced by an adaptive rate limiter (default: 0)",
         )
         parser.add_argument(
             "--dry-run",
@@ -192,21 +242,46 @@ def load_liked():
             "they are added in the opposite order from other commands in this program.",
         )
 
+        parser.add_argument(
+            "--group-albums",
+            action="store_true",
+            help="Look up each album once and match its tracks against it, rather than "
+            "searching for the album for every track.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of songs to look up on YTMusic concurrently, songs are still "
+            "added in playlist order (default: 1)",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Skip the tracks that an interrupted previous run already copied.",
+        )
+        add_match_cache_arguments(parser)
+
         return parser.parse_args()
 
     args = parse_arguments()
 
-    backend.copier(
-        backend.iter_spotify_playlist(
+    with CopyJournal("liked_songs", "likes", args.resume) as journal:
+        backend.copier(
+            backend.iter_spotify_playlist(
+                None,
+                spotify_encoding=args.spotify_playlists_encoding,
+                reverse_playlist=args.reverse_playlist,
+            ),
             None,
-            spotify_encoding=args.spotify_playlists_encoding,
-            reverse_playlist=args.reverse_playlist,
-        ),
-        None,
-        args.dry_run,
-        args.track_sleep,
-        args.algo,
-    )
+            args.dry_run,
+            args.track_sleep,
+            args.algo,
+            match_cache=open_match_cache(args),
+            group_albums=args.group_albums,
+            workers=args.workers,
+            journal=journal,
+        )
 
 
 def copy_playlist():
@@ -219,8 +294,9 @@ def copy_playlist():
         parser.add_argument(
             "--track-sleep",
             type=float,
-            default=0.1,
-            help="Time to sleep between each track that is added (default: 0.1)",
+            default=0,
+            help="Extra time to sleep between each track that is added, requests are "
+            "already paced by an adaptive rate limiter (default: 0)",
         )
         parser.add_argument(
             "--dry-run",
@@ -260,6 +336,38 @@ def copy_playlist():
             help="The privacy seting of created playlists (PRIVATE, PUBLIC, UNLISTED, default PRIVATE)",
         )
 
+        parser.add_argument(
+            "--group-albums",
+            action="store_true",
+            help="Look up each album once and match its tracks against it, rather than "
+            "searching for the album for every track.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of songs to look up on YTMusic concurrently, songs are still "
+            "added in playlist order (default: 1)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=backend.DEFAULT_BATCH_SIZE,
+            help="Number of tracks added to the YTMusic playlist per request "
+            f"(default: {backend.DEFAULT_BATCH_SIZE})",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Skip the tracks that an interrupted previous run already copied.",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only copy the tracks that are not already in the YTMusic playlist.",
+        )
+        add_match_cache_arguments(parser)
+
         return parser.parse_args()
 
     args = parse_arguments()
@@ -271,6 +379,12 @@ def copy_playlist():
         spotify_playlists_encoding=args.spotify_playlists_encoding,
         reverse_playlist=not args.no_reverse_playlist,
         privacy_status=args.privacy,
+        match_cache=open_match_cache(args),
+        group_albums=args.group_albums,
+        workers=args.workers,
+        resume=args.resume,
+        incremental=args.incremental,
+        batch_size=args.batch_size,
     )
 
 
@@ -284,8 +398,9 @@ def copy_all_playlists():
         parser.add_argument(
             "--track-sleep",
             type=float,
-            default=0.1,
-            help="Time to sleep between each track that is added (default: 0.1)",
+            default=0,
+            help="Extra time to sleep between each track that is added, requests are "
+            "already paced by an adaptive rate limiter (default: 0)",
         )
         parser.add_argument(
             "--dry-run",
@@ -315,6 +430,38 @@ def copy_all_playlists():
             help="The privacy seting of created playlists (PRIVATE, PUBLIC, UNLISTED, default PRIVATE)",
         )
 
+        parser.add_argument(
+            "--group-albums",
+            action="store_true",
+            help="Look up each album once and match its tracks against it, rather than "
+            "searching for the album for every track.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of songs to look up on YTMusic concurrently, songs are still "
+            "added in playlist order (default: 1)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=backend.DEFAULT_BATCH_SIZE,
+            help="Number of tracks added to the YTMusic playlist per request "
+            f"(default: {backend.DEFAULT_BATCH_SIZE})",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Skip the tracks that an interrupted previous run already copied.",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only copy the tracks that are not already in the YTMusic playlist.",
+        )
+        add_match_cache_arguments(parser)
+
         return parser.parse_args()
 
     args = parse_arguments()
@@ -324,9 +471,83 @@ def copy_all_playlists():
         spotify_playlists_encoding=args.spotify_playlists_encoding,
         reverse_playlist=not args.no_reverse_playlist,
         privacy_status=args.privacy,
+        match_cache=open_match_cache(args),
+        group_albums=args.group_albums,
+        workers=args.workers,
+        resume=args.resume,
+        incremental=args.incremental,
+        batch_size=args.batch_size,
     )
 
 
+def match_cache():
+    """
+    Inspect or purge the song match cache used by the copy commands.
+    """
+
+    def parse_arguments():
+        parser = ArgumentParser()
+        parser.add_argument(
+            "--match-cache",
+            default=DEFAULT_CACHE_FILE,
+            help=f"The match cache file (default: {DEFAULT_CACHE_FILE})",
+        )
+        subparsers = parser.add_subparsers(dest="action", required=True)
+
+        subparsers.add_parser("stats", help="Show a summary of the cache")
+
+        list_parser = subparsers.add_parser("list", help="List cached matches")
+        list_parser.add_argument(
+            "pattern",
+            nargs="?",
+            help="Only list entries whose title, artist or album contain this text",
+        )
+        list_parser.add_argument(
+            "--limit",
+            type=int,
+            default=100,
+            help="Maximum number of entries to list (default: 100)",
+        )
+
+        purge_parser = subparsers.add_parser("purge", help="Remove cached matches")
+        purge_parser.add_argument(
+            "pattern",
+            nargs="?",
+            help="Only remove entries whose title, artist or album contain this text",
+        )
+        purge_parser.add_argument(
+            "--older-than",
+            type=float,
+            help="Only remove entries older than this many days",
+        )
+
+        return parser.parse_args()
+
+    args = parse_arguments()
+
+    with MatchCache(args.match_cache) as cache:
+        if args.action == "stats":
+            stats = cache.stats()
+            print(f"File:    {stats['file']} ({stats['size_bytes']} bytes)")
+            print(f"Entries: {stats['entries']}")
+            if stats["entries"]:
+                print(f"Oldest:  {time.ctime(stats['oldest'])}")
+                print(f"Newest:  {time.ctime(stats['newest'])}")
+        elif args.action == "list":
+            for (title, artist, album, algo), song, created_at in cache.entries(
+                args.pattern, args.limit
+            ):
+                print(
+                    f"{title} - {artist} - {album} (algo {algo}) => {song.get('videoId')} - {song.get('title')}"
+                )
+        elif args.action == "purge":
+            older_than = None
+            if args.older_than is not None:
+                older_than = args.older_than * 24 * 60 * 60
+            removed = cache.purge(older_than=older_than, pattern=args.pattern)
+            print(f"Removed {removed} entries from {args.match_cache}")
+
+
 def gui():
     """
     Run the Spotify2YTMusic GUI.
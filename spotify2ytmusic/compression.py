@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+import gzip
+import io
+from typing import Optional, TextIO
+
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+#  Compression used when writing, by file name suffix
+SUFFIXES = {".gz": "gzip", ".zst": "zstd"}
+
+
+def _zstandard():
+    """Import the optional `zstandard` package, only needed for .zst files."""
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError(
+            "Compressed (.zst) backups need the zstandard package: pip install zstandard"
+        ) from None
+    return zstandard
+
+
+def compression_for(filename: str) -> Optional[str]:
+    """The compression ("gzip", "zstd" or None) to write `filename` with."""
+    for suffix, compression in SUFFIXES.items():
+        if filename.endswith(suffix):
+            return compression
+    return None
+
+
+def detect_compression(filename: str) -> Optional[str]:
+    """The compression ("gzip", "zstd" or None) of an existing file, from its contents."""
+    with open(filename, "rb") as f:
+        magic = f.read(len(ZSTD_MAGIC))
+    if magic.startswith(GZIP_MAGIC):
+        return "gzip"
+    if magic == ZSTD_MAGIC:
+        return "zstd"
+    return None
+
+
+def open_text(
+    filename: str,
+    mode: str = "r",
+    encoding: str = "utf-8",
+    compression: Optional[str] = None,
+) -> TextIO:
+    """Open a backup file as text, compressing or decompressing it transparently.
+
+    When reading ("r"), the compression is detected from the contents of the file.
+    When writing ("w"), it is `compression` if given, otherwise chosen by the file
+    name's suffix (".gz" or ".zst").
+    """
+    if mode == "r":
+        compression = detect_compression(filename)
+    elif mode == "w":
+        compression = compression or compression_for(filename)
+    else:
+        raise ValueError(f"Unsupported mode {mode!r}")
+
+    if compression is None:
+        return open(filename, mode, encoding=encoding)
+    if compression == "gzip":
+        return gzip.open(filename, mode + "t", encoding=encoding)
+    if compression == "zstd":
+        zstandard = _zstandard()
+        raw = open(filename, mode + "b")
+        if mode == "r":
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+            return io.TextIOWrapper(io.BufferedReader(stream), encoding=encoding)
+        stream = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding=encoding)
+    raise ValueError(f"Unknown compression {compression!r}")
@@ -160,7 +160,7 @@ class Window:
                     backend.iter_spotify_playlist(),
                     None,
                     False,
-                    0.1,
+                    0,
                     self.var_algo.get(),
                 ),
                 next_tab=self.tab4,
@@ -190,7 +190,7 @@ class Window:
             text="Copy",
             command=lambda: self.call_func(
                 func=backend.copy_all_playlists,
-                args=(0.1, False, "utf-8", self.var_algo.get()),
+                args=(0, False, "utf-8", self.var_algo.get()),
                 next_tab=self.tab6,
             ),
         ).pack(anchor=tk.CENTER, expand=True)
@@ -220,7 +220,7 @@ class Window:
                     self.yt_playlist_id.get(),
                     "utf-8",
                     False,
-                    0.1,
+                    0,
                     self.var_algo.get(),
                 ),
                 next_tab=self.tab6,
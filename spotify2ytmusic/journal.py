@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import re
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+
+DEFAULT_JOURNAL_DIR = "s2yt_journal"
+
+
+def _safe_name(value: Optional[str]) -> str:
+    return re.sub(r"[^A-Za-z0-9_-]", "_", str(value))
+
+
+def _compact_song(song: dict) -> dict:
+    """The parts of a YTMusic song that the copier needs to resume."""
+    compact = {"videoId": song["videoId"], "title": song.get("title")}
+    if song.get("artists"):
+        compact["artists"] = [{"name": song["artists"][0].get("name")}]
+    return compact
+
+
+class CopyJournal:
+    """Append-only journal of the progress of copying one playlist.
+
+    There is one journal file per (source playlist, destination playlist) pair.  Each
+    line records either that the track at a position in the source was resolved to a
+    YTMusic song, or that it was committed (added to the destination).  When resuming,
+    committed tracks are skipped entirely, and resolved tracks are added without
+    looking them up again, so no network calls are made for work already done.
+
+    Entries are matched on both the position and the (title, artist, album) of the
+    source track, so a journal for a backup that has since changed is only used where
+    it still agrees with the source.
+    """
+
+    def __init__(
+        self,
+        src_pl_id: Optional[str],
+        dst_pl_id: Optional[str],
+        resume: bool = False,
+        directory: str = DEFAULT_JOURNAL_DIR,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.filename = os.path.join(
+            directory, f"{_safe_name(src_pl_id)}--{_safe_name(dst_pl_id)}.jsonl"
+        )
+        self._resolved: Dict[int, Tuple[tuple, dict]] = {}
+        self._committed: Dict[int, tuple] = {}
+
+        if resume and os.path.exists(self.filename):
+            self._load()
+            print(
+                f"Resuming from {self.filename}: {len(self._committed)} tracks already copied"
+            )
+
+        self._file = open(self.filename, "a" if resume else "w", encoding="utf-8")
+
+    def _load(self) -> None:
+        with open(self.filename, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    #  A partially written last line from an interrupted run
+                    continue
+                track = tuple(entry["track"])
+                if entry["event"] == "resolved":
+                    self._resolved[entry["pos"]] = (track, entry["song"])
+                elif entry["event"] == "committed":
+                    self._committed[entry["pos"]] = track
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "CopyJournal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _write(self, entry: dict) -> None:
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def is_committed(self, position: int, src_track: tuple) -> bool:
+        return self._committed.get(position) == tuple(src_track)
+
+    def committed_video_ids(self) -> Set[str]:
+        """The videoIds of the committed tracks (where known)."""
+        return {
+            song["videoId"]
+            for position, (track, song) in self._resolved.items()
+            if self._committed.get(position) == track
+        }
+
+    def resolved_song(self, position: int, src_track: tuple) -> Optional[dict]:
+        """The song `src_track` was previously resolved to, if any."""
+        entry = self._resolved.get(position)
+        if entry is None or entry[0] != tuple(src_track):
+            return None
+        return entry[1]
+
+    def record_resolved(self, position: int, src_track: tuple, song: dict) -> None:
+        compact = _compact_song(song)
+        self._resolved[position] = (tuple(src_track), compact)
+        self._write(
+            {
+                "event": "resolved",
+                "pos": position,
+                "track": list(src_track),
+                "song": compact,
+            }
+        )
+
+    def record_committed(self, entries: Iterable[Tuple[int, tuple]]) -> None:
+        for position, src_track in entries:
+            self._committed[position] = tuple(src_track)
+            self._write(
+                {"event": "committed", "pos": position, "track": list(src_track)}
+            )
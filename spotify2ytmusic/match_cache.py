@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Iterator, Optional, Tuple
+
+
+DEFAULT_CACHE_FILE = "match_cache.db"
+DEFAULT_TTL = 90 * 24 * 60 * 60  # 90 days
+DEFAULT_MAX_ENTRIES = 200_000
+
+CacheKey = Tuple[str, str, str, int]
+
+
+def normalize(value: Optional[str]) -> str:
+    """Normalize a title/artist/album for use in a cache key.
+
+    Case and surrounding/repeated whitespace are not significant to a match, so
+    "Survival " and "survival" share an entry.
+    """
+    if value is None:
+        return ""
+    return re.sub(r"\s+", " ", str(value)).strip().casefold()
+
+
+def make_key(
+    track_name: str, artist_name: str, album_name: Optional[str], yt_search_algo: int
+) -> CacheKey:
+    """Build the cache key for a lookup."""
+    return (
+        normalize(track_name),
+        normalize(artist_name),
+        normalize(album_name),
+        int(yt_search_algo),
+    )
+
+
+class MatchCache:
+    """Persistent (SQLite) cache of Spotify track -> YTMusic song matches.
+
+    Entries are keyed on the normalized (title, artist, album, search algo) and store
+    the song dict that `backend.lookup_song` returned.  Entries older than `ttl`
+    seconds are ignored and removed by `evict()`, which also trims the cache down to
+    `max_entries` by dropping the least recently used entries.
+
+    A cache may be shared between threads, and between processes.  By default the
+    cache file uses SQLite's WAL `journal_mode`, so that readers carry on while one
+    process is writing.  WAL needs shared memory between the processes, so a cache
+    file on a network filesystem should use the rollback journal ("DELETE") instead.
+    """
+
+    def __init__(
+        self,
+        filename: str = DEFAULT_CACHE_FILE,
+        ttl: Optional[float] = DEFAULT_TTL,
+        max_entries: Optional[int] = DEFAULT_MAX_ENTRIES,
+        journal_mode: str = "WAL",
+    ):
+        self.filename = filename
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        #  Wait for the writes of other processes rather than failing.  The journal
+        #  mode is stored in the file, so it is set even when it is the default.
+        self._db = sqlite3.connect(filename, check_same_thread=False, timeout=30)
+        self._db.execute(f"PRAGMA journal_mode={journal_mode}")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS matches (
+                title TEXT NOT NULL,
+                artist TEXT NOT NULL,
+                album TEXT NOT NULL,
+                algo INTEGER NOT NULL,
+                song TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (title, artist, album, algo)
+            )"""
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS matches_last_used ON matches (last_used)"
+        )
+        self._db.commit()
+        self.evict()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "MatchCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _expiry(self) -> float:
+        if self.ttl is None:
+            return 0.0
+        return time.time() - self.ttl
+
+    def get(self, key: CacheKey) -> Optional[dict]:
+        """Return the cached song for `key`, or None if missing or expired."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT song FROM matches WHERE title=? AND artist=? AND album=? AND algo=? "
+                "AND created_at >= ?",
+                (*key, self._expiry()),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._db.execute(
+                "UPDATE matches SET last_used=? WHERE title=? AND artist=? AND album=? AND algo=?",
+                (time.time(), *key),
+            )
+            self._db.commit()
+        return json.loads(row[0])
+
+    def peek(self, key: CacheKey) -> Optional[dict]:
+        """Like `get()`, but without counting a hit/miss or refreshing the entry."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT song FROM matches WHERE title=? AND artist=? AND album=? AND algo=? "
+                "AND created_at >= ?",
+                (*key, self._expiry()),
+            ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def put(self, key: CacheKey, song: dict) -> None:
+        """Store (or replace) the song matched for `key`."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO matches "
+                "(title, artist, album, algo, song, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*key, json.dumps(song), now, now),
+            )
+            self._db.commit()
+
+    def evict(self) -> int:
+        """Drop expired entries and trim to `max_entries`.  Returns the number removed."""
+        removed = self._db.execute(
+            "DELETE FROM matches WHERE created_at < ?", (self._expiry(),)
+        ).rowcount
+        if self.max_entries is not None:
+            removed += self._db.execute(
+                "DELETE FROM matches WHERE rowid IN ("
+                "SELECT rowid FROM matches ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+        self._db.commit()
+        return removed
+
+    def purge(
+        self, older_than: Optional[float] = None, pattern: Optional[str] = None
+    ) -> int:
+        """Remove entries from the cache.
+
+        Args:
+            `older_than` (float, optional): Only remove entries created more than this many seconds ago.
+            `pattern` (str, optional): Only remove entries whose title, artist or album contain this text.
+
+        Returns:
+            int: The number of entries removed.
+        """
+        query = "DELETE FROM matches WHERE 1=1"
+        params: list = []
+        if older_than is not None:
+            query += " AND created_at < ?"
+            params.append(time.time() - older_than)
+        if pattern is not None:
+            query += " AND (title LIKE ? OR artist LIKE ? OR album LIKE ?)"
+            params.extend([f"%{normalize(pattern)}%"] * 3)
+        removed = self._db.execute(query, params).rowcount
+        self._db.commit()
+        return removed
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+
+    def entries(
+        self, pattern: Optional[str] = None, limit: Optional[int] = None
+    ) -> Iterator[Tuple[CacheKey, dict, float]]:
+        """Iterate over (key, song, created_at), most recently used first."""
+        query = "SELECT title, artist, album, algo, song, created_at FROM matches"
+        params: list = []
+        if pattern is not None:
+            query += " WHERE title LIKE ? OR artist LIKE ? OR album LIKE ?"
+            params.extend([f"%{normalize(pattern)}%"] * 3)
+        query += " ORDER BY last_used DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        for title, artist, album, algo, song, created_at in self._db.execute(
+            query, params
+        ):
+            yield (title, artist, album, algo), json.loads(song), created_at
+
+    def stats(self) -> dict:
+        """Summary information about the cache file and this session's usage."""
+        count, oldest, newest = self._db.execute(
+            "SELECT COUNT(*), MIN(created_at), MAX(created_at) FROM matches"
+        ).fetchone()
+        return {
+            "file": self.filename,
+            "size_bytes": os.path.getsize(self.filename)
+            if os.path.exists(self.filename)
+            else 0,
+            "entries": count,
+            "oldest": oldest,
+            "newest": newest,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+
+R = TypeVar("R")
+
+#  Initial settings for the shared limiters returned by `get_limiter()`
+LIMITER_DEFAULTS: Dict[str, Dict[str, float]] = {
+    "ytmusic": {"rate": 5.0, "max_rate": 20.0},
+    "spotify": {"rate": 10.0, "max_rate": 50.0},
+}
+
+
+class PermanentError(Exception):
+    """A failure that retrying cannot fix, such as a request for a missing resource.
+
+    It is not retried, and does not count against the service's rate.
+    """
+
+
+#  Exceptions that indicate a bug or a bad response rather than an overloaded
+#  service: retrying them does not help, and they should not slow us down.
+NON_RETRYABLE = (
+    KeyError,
+    IndexError,
+    TypeError,
+    ValueError,
+    AttributeError,
+    PermanentError,
+)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header value (in seconds), None if missing or not a number."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def retry_after_from(exc: BaseException) -> Optional[float]:
+    """Return the Retry-After time carried by an exception, if any."""
+    headers = getattr(exc, "headers", None)
+    if headers is not None:
+        return parse_retry_after(headers.get("Retry-After"))
+    return None
+
+
+def is_throttled(exc: BaseException) -> bool:
+    """Does the exception indicate that we are being rate limited (HTTP 429)?"""
+    if getattr(exc, "code", None) == 429 or getattr(exc, "status", None) == 429:
+        return True
+    return re.search(r"\bHTTP 429\b", str(exc)) is not None
+
+
+class RateLimiter:
+    """Adaptive token bucket shared by all calls to one service.
+
+    `acquire()` blocks until a request may be made.  The permitted rate (requests per
+    second) is adjusted AIMD style: every `success()` increases it by `increase`, every
+    `failure()` multiplies it by `decrease`, so we run at the fastest rate the service
+    is currently willing to accept rather than at a guessed constant.  A Retry-After
+    given to `failure()` blocks all callers until it has passed.
+
+    `call()` wraps a single request with `acquire()`/`success()`/`failure()`, `retry()`
+    retries a function with jittered exponential back-off, giving up once `max_wait`
+    seconds would be spent waiting.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float = 5.0,
+        burst: float = 5.0,
+        min_rate: float = 0.1,
+        max_rate: float = 20.0,
+        increase: float = 0.05,
+        decrease: float = 0.5,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        max_wait: float = 600.0,
+    ):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_wait = max_wait
+
+        self.requests = 0
+        self.failures = 0
+        self.throttled = 0
+        self.waited = 0.0
+
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a request may be made."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if now >= self._blocked_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    self.requests += 1
+                    return
+                wait = max(self._blocked_until - now, (1 - self._tokens) / self.rate)
+                self.waited += wait
+            time.sleep(wait)
+
+    def success(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def failure(
+        self, retry_after: Optional[float] = None, throttled: bool = False
+    ) -> None:
+        with self._lock:
+            self.failures += 1
+            if throttled or retry_after is not None:
+                self.throttled += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after is not None:
+                self._blocked_until = max(
+                    self._blocked_until,
+                    time.monotonic() + min(retry_after, self.max_wait),
+                )
+
+    def backoff(self, attempt: int) -> float:
+        """Jittered exponential back-off delay for the `attempt`th retry (from 0)."""
+        delay = min(self.max_backoff, self.base_backoff * 2**attempt)
+        return random.uniform(delay / 2, delay)
+
+    def call(self, func: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+        """Make one request through the limiter, feeding the outcome back into the rate."""
+        self.acquire()
+        try:
+            result = func(*args, **kwargs)
+        except NON_RETRYABLE:
+            raise
+        except Exception as e:
+            self.failure(retry_after_from(e), is_throttled(e))
+            raise
+        self.success()
+        return result
+
+    def retry(self, func: Callable[[], R], description: str, tries: int = 10) -> R:
+        """Call `func`, retrying with jittered back-off if it raises.
+
+        Gives up (re-raising the last exception) after `tries` attempts, or when the
+        next back-off would take the total time spent waiting past `max_wait`.
+        Exceptions in `NON_RETRYABLE` are raised immediately.
+        """
+        waited = 0.0
+        for attempt in range(tries):
+            try:
+                return func()
+            except NON_RETRYABLE:
+                raise
+            except Exception as e:
+                delay = retry_after_from(e)
+                if delay is None:
+                    delay = self.backoff(attempt)
+                if attempt == tries - 1 or waited + delay > self.max_wait:
+                    raise
+                print(f"ERROR: (Retrying {description}) {e} in {delay:.1f} seconds")
+                time.sleep(delay)
+                waited += delay
+        raise AssertionError("unreachable")
+
+    def stats(self) -> str:
+        return (
+            f"{self.name}: {self.requests} requests, {self.failures} failures "
+            f"({self.throttled} throttled), {self.waited:.1f}s waiting, "
+            f"now {self.rate:.2f} requests/s"
+        )
+
+
+class RateLimited:
+    """Proxy that sends every method call on `client` through `limiter.call()`."""
+
+    def __init__(self, client: Any, limiter: RateLimiter):
+        self.client = client
+        self.limiter = limiter
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+
+        def limited(*args, **kwargs):
+            return self.limiter.call(attr, *args, **kwargs)
+
+        return limited
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str) -> RateLimiter:
+    """Return the limiter shared by everything in this process talking to `name`."""
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = RateLimiter(name, **LIMITER_DEFAULTS.get(name, {}))
+        return _limiters[name]
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Tuple
+
+
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+#  YTMusic read calls whose responses are worth re-using within a run
+CACHED_METHODS = ("search", "get_album", "get_search_suggestions")
+
+
+class CachingYTMusic:
+    """In-process LRU cache of YTMusic read responses.
+
+    Wraps a YTMusic instance, answering repeated `search`, `get_album` and
+    `get_search_suggestions` calls with the same arguments from memory.  All other
+    attributes are passed through to the wrapped instance.
+
+    The cache is bounded both by number of entries and by the (approximate, JSON
+    encoded) size of the cached responses, the least recently used entries are
+    dropped first.  The cache may be shared between threads.
+    """
+
+    def __init__(
+        self,
+        yt,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.yt = yt
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.size_bytes = 0
+        self._entries: "OrderedDict[Tuple, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.yt, name)
+        if name not in CACHED_METHODS:
+            return attr
+
+        def cached(*args, **kwargs):
+            return self._call(name, attr, args, kwargs)
+
+        return cached
+
+    def _call(self, name: str, method, args: tuple, kwargs: dict) -> Any:
+        key = (name, repr(args), repr(sorted(kwargs.items())))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry[0]
+            self.misses += 1
+
+        value = method(*args, **kwargs)
+        self._store(key, value)
+        return value
+
+    def _store(self, key: Tuple, value: Any) -> None:
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size_bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self.size_bytes += size
+            while (
+                len(self._entries) > self.max_entries
+                or self.size_bytes > self.max_bytes
+            ):
+                _, (_, dropped) = self._entries.popitem(last=False)
+                self.size_bytes -= dropped
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def print_stats(self) -> None:
+        total = self.hits + self.misses
+        rate = f"{100 * self.hits / total:.0f}%" if total else "n/a"
+        print(
+            f"YTMusic response cache: {self.hits} hits, {self.misses} misses ({rate} hit rate), "
+            f"{len(self._entries)} entries, {self.size_bytes} bytes"
+        )
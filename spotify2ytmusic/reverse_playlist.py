@@ -1,46 +1,36 @@
 #!/usr/bin/env python3
 
-import json
 import os
-import shutil
 from argparse import ArgumentParser
 
+try:
+    from .backup_meta import load_metadata, save_metadata
+except ImportError:
+    #  Allow running this file directly as a script
+    from backup_meta import load_metadata, save_metadata
+
 
 def reverse_playlist(input_file="playlists.json", verbose=True, replace=False) -> int:
-    if os.path.exists(input_file) and not replace:
+    """Reverse the order of the tracks of every playlist in a backup.
+
+    The backup itself is not rewritten: the reversal is recorded in its metadata
+    (`<input_file>.meta.json`) and applied when the playlists are read, so this takes
+    no time however large the backup is.  Reversing again restores the original order.
+    `replace` is accepted for compatibility, the file is no longer replaced.
+    """
+    if not os.path.exists(input_file):
         if verbose:
-            print(
-                "Output file already exists and no replace argument detected, exiting..."
-            )
+            print(f"Input file {input_file} does not exist, exiting...")
         return 1
 
-    print("Backing up file...")
-    shutil.copyfile(input_file, input_file.split(".")[0] + "_backup.json")
-    # Load the JSON file
-    with open(input_file, "r") as file:
-        if verbose:
-            print("Loading initial JSON file...")
-        data = json.load(file)
-
-    # Copy the data to a new dictionary
-    data2 = data.copy()
-
-    if verbose:
-        print("Reversing playlists...")
-    # Reverse the order of items in the "tracks" list
-    for i in range(len(data2["playlists"])):
-        # Reverse the tracks in the playlist
-        data2["playlists"][i]["tracks"] = data2["playlists"][i]["tracks"][::-1]
-
-    if verbose:
-        print("Writing to file... (this can take a while)")
-    # Write the modified JSON back to the file
-    with open(input_file, "w") as file:
-        json.dump(data2, file)
+    metadata = load_metadata(input_file)
+    metadata["reversed"] = not metadata.get("reversed", False)
+    save_metadata(input_file, metadata)
 
     if verbose:
         print("Done!")
-        print(f"File can be found at {input_file}")
+        state = "reversed" if metadata["reversed"] else "in their original order"
+        print(f"The playlists in {input_file} will now be read {state}")
 
     return 0
 
@@ -55,7 +45,7 @@ if __name__ == "__main__":
         "-r",
         "--replace",
         action="store_true",
-        help="Replace the output file if already existing",
+        help="Ignored, the file is no longer rewritten (kept for compatibility)",
     )
 
     args = parser.parse_args()
@@ -3,51 +3,178 @@
 #  This file is licensed under the MIT license
 #  This file originates from https://github.com/caseychu/spotify-backup
 
-import codecs
-import http.client
 import http.server
 import json
+import os
 import re
+import sqlite3
 import sys
+import threading
 import time
 import urllib.error
 import urllib.parse
-import urllib.request
 import webbrowser
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from .backup_db import BackupDBWriter
+    from .backup_meta import clear_metadata
+    from .compression import compression_for, open_text
+    from .ratelimit import PermanentError, get_limiter
+    from .stream_json import iter_array_items
+    from .transport import get_transport
+except ImportError:
+    #  Allow running this file directly as a script
+    from backup_db import BackupDBWriter
+    from backup_meta import clear_metadata
+    from compression import compression_for, open_text
+    from ratelimit import PermanentError, get_limiter
+    from stream_json import iter_array_items
+    from transport import get_transport
+
+
+#  Number of pages/playlists fetched concurrently
+DEFAULT_WORKERS = 4
+
+#  Spotify IDs in API paths, replaced by "{id}" to group requests by endpoint
+_SPOTIFY_ID = re.compile(r"(?<=/)[0-9A-Za-z]{22}(?=/|$)")
+
+
+class SpotifyAPIError(PermanentError):
+    """A Spotify API request failed, either permanently or after retrying.
+
+    `status` is the HTTP status of the last response, None if there was none.
+    """
+
+    def __init__(self, url, status, message):
+        super().__init__(f"Error fetching URL {url}: {message}")
+        self.url = url
+        self.status = status
+
+
+class EndpointStats:
+    """Request, retry and latency counters per Spotify API endpoint."""
+
+    def __init__(self):
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def endpoint(url):
+        path = urllib.parse.urlsplit(url).path
+        return _SPOTIFY_ID.sub("{id}", path.split("/v1/", 1)[-1])
+
+    def record(self, url, latency, attempts, failed):
+        with self._lock:
+            counters = self.endpoints.setdefault(
+                self.endpoint(url),
+                {
+                    "requests": 0,
+                    "retries": 0,
+                    "failures": 0,
+                    "latency": 0.0,
+                    "max": 0.0,
+                },
+            )
+            counters["requests"] += 1
+            counters["retries"] += max(0, attempts - 1)
+            counters["failures"] += int(failed)
+            counters["latency"] += latency
+            counters["max"] = max(counters["max"], latency)
+
+    def report(self):
+        lines = []
+        with self._lock:
+            for endpoint, c in sorted(self.endpoints.items()):
+                lines.append(
+                    f"  {endpoint}: {c['requests']} requests, {c['retries']} retries, "
+                    f"{c['failures']} failed, "
+                    f"{c['latency'] / c['requests']:.2f}s average, {c['max']:.2f}s max"
+                )
+        return "\n".join(lines)
 
 
 class SpotifyAPI:
-    """Class to interact with the Spotify API using an OAuth token."""
+    """Class to interact with the Spotify API using an OAuth token.
+
+    Up to `workers` requests are made concurrently when fetching lists, they are all
+    paced by the shared "spotify" rate limiter.  Requests go through a pool of
+    keep-alive connections (by default the one shared by the whole process).
+    """
 
     BASE_URL = "https://api.spotify.com/v1/"
 
-    def __init__(self, auth):
+    def __init__(self, auth, workers=DEFAULT_WORKERS, transport=None):
         self._auth = auth
+        self._limiter = get_limiter("spotify")
+        self.workers = workers
+        self.transport = transport or get_transport()
+        self.stats = EndpointStats()
 
-    def get(self, url, params={}, tries=3):
-        """Fetch a resource from Spotify API."""
+    def get(self, url, params={}, tries=5):
+        """Fetch a resource from Spotify API.
+
+        Rate limiting (429, honoring Retry-After) and server errors (5xx) are retried
+        with back-off, other client errors (4xx) fail immediately.
+
+        Raises:
+            SpotifyAPIError: The request failed, or still failed after `tries` attempts.
+        """
         url = self._construct_url(url, params)
-        for _ in range(tries):
-            try:
-                req = self._create_request(url)
-                return self._read_response(req)
-            except Exception as err:
-                print(f"Error fetching URL {url}: {err}")
-                time.sleep(2)
-        sys.exit("Failed to fetch data from Spotify API after retries.")
+        attempts = 0
+        start = time.monotonic()
+
+        def attempt():
+            nonlocal attempts
+            attempts += 1
+            return self._limiter.call(self._read_response, url)
+
+        failed = True
+        try:
+            response = self._limiter.retry(attempt, f"fetching URL {url}", tries=tries)
+            failed = False
+            return response
+        except SpotifyAPIError:
+            raise
+        except Exception as err:
+            raise SpotifyAPIError(
+                url,
+                getattr(err, "code", None),
+                f"{err} (after {attempts} attempts)",
+            ) from err
+        finally:
+            self.stats.record(url, time.monotonic() - start, attempts, failed)
 
     def list(self, url, params={}):
-        """Fetch paginated resources and return as a combined list."""
+        """Fetch paginated resources and return as a combined list.
+
+        The first page gives the total and page size, so for offset-paged lists the
+        remaining pages are fetched concurrently (and combined in order).
+        """
         response = self.get(url, params)
         items = response["items"]
 
+        if self.workers > 1 and response["next"] and "offset" in response:
+            limit = response["limit"]
+            offsets = range(response["offset"] + limit, response["total"], limit)
+            with ThreadPoolExecutor(self.workers) as pool:
+                for page in pool.map(
+                    lambda offset: self.get(
+                        url, {**params, "offset": offset, "limit": limit}
+                    ),
+                    offsets,
+                ):
+                    items += page["items"]
+            return items
+
         while response["next"]:
             response = self.get(response["next"])
             items += response["items"]
         return items
 
     @staticmethod
-    def authorize(client_id, scope):
+    def authorize(client_id, scope, workers=DEFAULT_WORKERS):
         """Open a browser for user authorization and return SpotifyAPI instance."""
         redirect_uri = f"http://127.0.0.1:{SpotifyAPI._SERVER_PORT}/redirect"
         url = SpotifyAPI._construct_auth_url(client_id, scope, redirect_uri)
@@ -59,7 +186,7 @@ class SpotifyAPI:
             while True:
                 server.handle_request()
         except SpotifyAPI._Authorization as auth:
-            return SpotifyAPI(auth.access_token)
+            return SpotifyAPI(auth.access_token, workers)
 
     @staticmethod
     def _construct_auth_url(client_id, scope, redirect_uri):
@@ -80,17 +207,16 @@ class SpotifyAPI:
             url += ("&" if "?" in url else "?") + urllib.parse.urlencode(params)
         return url
 
-    def _create_request(self, url):
-        """Create an authenticated request."""
-        req = urllib.request.Request(url)
-        req.add_header("Authorization", f"Bearer {self._auth}")
-        return req
-
-    def _read_response(self, req):
-        """Read and parse the response."""
-        with urllib.request.urlopen(req) as res:
-            reader = codecs.getreader("utf-8")
-            return json.load(reader(res))
+    def _read_response(self, url):
+        """Make an authenticated request and parse the response."""
+        try:
+            return self.transport.get_json(
+                url, {"Authorization": f"Bearer {self._auth}"}
+            )
+        except urllib.error.HTTPError as err:
+            if err.code != 429 and 400 <= err.code < 500:
+                raise SpotifyAPIError(url, err.code, str(err)) from err
+            raise
 
     _SERVER_PORT = 43019
 
@@ -136,71 +262,405 @@ class SpotifyAPI:
             self.access_token = access_token
 
 
-def fetch_user_data(spotify, dump):
-    """Fetch playlists and liked songs based on the dump parameter."""
+def list_new_items(spotify, url, params, previous):
+    """Fetch a list of saved items (newest first), re-using a previous copy of it.
+
+    Only the pages with items added since the newest one in `previous` are fetched.
+    If the result does not account for all of the items Spotify reports (because
+    something was removed), the whole list is fetched again.
+    """
+    if not previous:
+        return spotify.list(url, params)
+
+    newest = max(item.get("added_at") or "" for item in previous)
+    new_items = []
+    response = spotify.get(url, params)
+    while True:
+        for item in response["items"]:
+            if (item.get("added_at") or "") <= newest:
+                break
+            new_items.append(item)
+        else:
+            if response["next"]:
+                response = spotify.get(response["next"])
+                continue
+        break
+
+    items = new_items + previous
+    if len(items) != response["total"]:
+        print(f"  Saved items in {url} have changed, reloading all of them")
+        return spotify.list(url, params)
+    return items
+
+
+#  Parts of the Spotify objects kept by the "slim" backup profile, in the syntax of
+#  the Spotify API's `fields` parameter.  These are what the backend and the
+#  incremental backup need.
+SLIM_FIELDS = {
+    "playlists": "id,name,description,public,snapshot_id,owner(id,display_name),"
+    "tracks(href,total)",
+    "tracks": "added_at,track(name,uri,artists(name),album(name,release_date))",
+    "albums": "added_at,album(id,name,uri,release_date,artists(name),"
+    "tracks(items(name,uri,artists(name))))",
+}
+
+#  The field projection used by each backup profile (None keeps everything)
+BACKUP_PROFILES = {"full": None, "slim": SLIM_FIELDS}
+
+
+def parse_fields(fields):
+    """Parse a Spotify `fields` filter ("a,b(c,d)") into a nested dict.
+
+    Each key maps to None (keep the whole value) or to the dict for its sub-fields.
+    """
+    spec, stack, name = {}, [], ""
+    for char in fields + ",":
+        if char == "(":
+            stack.append(spec)
+            spec[name] = {}
+            spec, name = spec[name], ""
+        elif char in ",)":
+            if name:
+                spec[name] = None
+            name = ""
+            if char == ")":
+                spec = stack.pop()
+        else:
+            name += char.strip()
+    if stack:
+        raise ValueError(f"Unbalanced parentheses in fields: {fields!r}")
+    return spec
+
+
+def project(value, spec):
+    """Keep only the fields in `spec` (from `parse_fields`) of `value`."""
+    if spec is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, spec) for item in value]
+    if isinstance(value, dict):
+        return {
+            key: project(value[key], sub_spec)
+            for key, sub_spec in spec.items()
+            if key in value
+        }
+    return value
+
+
+def _imap_ordered(pool, func, items, window):
+    """Like `pool.map`, but with at most `window` calls submitted ahead of the results."""
+    pending = deque()
+    for item in items:
+        pending.append((item, pool.submit(func, item)))
+        if len(pending) >= window:
+            item, future = pending.popleft()
+            yield item, future.result()
+    while pending:
+        item, future = pending.popleft()
+        yield item, future.result()
+
+
+def fetch_user_data(spotify, dump, previous=None, fields=None, writer=None):
+    """Fetch playlists and liked songs based on the dump parameter.
+
+    If a `writer` (see `BackupWriter`) is given, each playlist is passed to it as soon
+    as its tracks have been fetched and is not kept, so only a few playlists are held
+    in memory at once; the returned lists are then empty.
+
+    With a `previous` backup (a `PreviousBackup`), only the changes since then are
+    fetched: playlists whose `snapshot_id` is unchanged are copied from it, and only
+    newly liked songs/albums are fetched.
+
+    `fields` limits what is kept of each playlist, track and album (see `SLIM_FIELDS`
+    for the format).  Spotify applies the filter to playlist tracks itself, so they
+    are also smaller to download; the other endpoints do not support it, and their
+    responses are trimmed once received.
+    """
     playlists = []
     liked_albums = []
 
+    def emit(playlist):
+        if writer is None:
+            playlists.append(playlist)
+        else:
+            writer.add_playlist(playlist)
+
+    specs = {kind: parse_fields(f) for kind, f in (fields or {}).items()}
+
+    def slim(kind, items):
+        return project(items, specs.get(kind))
+
+    track_params = {"limit": 100}
+    if "tracks" in (fields or {}):
+        track_params["fields"] = f"next,total,limit,offset,items({fields['tracks']})"
+
+    previous_liked = previous.liked if previous else []
+    previous_albums = previous.albums if previous else []
+
     if "liked" in dump:
         print("Loading liked albums and songs...")
-        liked_tracks = spotify.list("me/tracks", {"limit": 50})
-        liked_albums = spotify.list("me/albums", {"limit": 50})
-        playlists.append({"name": "Liked Songs", "tracks": liked_tracks})
+        liked_tracks = slim(
+            "tracks",
+            list_new_items(spotify, "me/tracks", {"limit": 50}, previous_liked),
+        )
+        liked_albums = slim(
+            "albums",
+            list_new_items(spotify, "me/albums", {"limit": 50}, previous_albums),
+        )
+        emit({"name": "Liked Songs", "tracks": liked_tracks})
+        del liked_tracks
+        if writer is not None:
+            writer.add_albums(liked_albums)
+            liked_albums = []
 
     if "playlists" in dump:
         print("Loading playlists...")
-        playlist_data = spotify.list("me/playlists", {"limit": 50})
-        for playlist in playlist_data:
+        playlist_data = slim("playlists", spotify.list("me/playlists", {"limit": 50}))
+
+        def fetch_tracks(playlist):
+            unchanged = (
+                previous.tracks(playlist["id"], playlist.get("snapshot_id"))
+                if previous
+                else None
+            )
+            if unchanged is not None:
+                print(f"Unchanged playlist: {playlist['name']}")
+                return unchanged
             print(f"Loading playlist: {playlist['name']}")
-            playlist["tracks"] = spotify.list(
-                playlist["tracks"]["href"], {"limit": 100}
+            return slim(
+                "tracks", spotify.list(playlist["tracks"]["href"], track_params)
             )
-        playlists.extend(playlist_data)
+
+        workers = max(1, spotify.workers)
+        with ThreadPoolExecutor(workers) as pool:
+            for playlist, tracks in _imap_ordered(
+                pool, fetch_tracks, playlist_data, workers
+            ):
+                emit({**playlist, "tracks": tracks})
 
     return playlists, liked_albums
 
 
+class PreviousBackup:
+    """The previous backup that an incremental backup is based on.
+
+    The tracks of the previous playlists are moved into a temporary SQLite database as
+    they are read, indexed by playlist ID, and only read back for the playlists that
+    are unchanged.  So, as when writing a backup, only one playlist is held in memory
+    at once.  The liked songs and albums are kept in memory, as they are merged with
+    the newly liked items anyway.
+    """
+
+    def __init__(self, playlists=(), albums=()):
+        self.liked = []
+        self._lock = threading.Lock()
+        #  An empty name is a temporary database, removed when it is closed
+        self._db = sqlite3.connect("", check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE playlists "
+            "(id TEXT PRIMARY KEY, snapshot_id TEXT NOT NULL, tracks TEXT NOT NULL)"
+        )
+        for playlist in playlists:
+            if playlist.get("id") is None and playlist.get("name") == "Liked Songs":
+                self.liked = playlist["tracks"]
+            elif playlist.get("snapshot_id"):
+                self._db.execute(
+                    "INSERT OR REPLACE INTO playlists VALUES (?, ?, ?)",
+                    (
+                        playlist["id"],
+                        playlist["snapshot_id"],
+                        json.dumps(playlist["tracks"]),
+                    ),
+                )
+        self._db.commit()
+        self.albums = list(albums)
+
+    def tracks(self, playlist_id, snapshot_id):
+        """The previous tracks of the playlist, None unless it had `snapshot_id`."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT tracks FROM playlists WHERE id = ? AND snapshot_id = ?",
+                (playlist_id, snapshot_id),
+            ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_previous_backup(file):
+    """Read a previous JSON backup for an incremental backup, None if there is none.
+
+    The backup is streamed into a `PreviousBackup` rather than loaded all at once.
+    """
+
+    def stream(key):
+        with open_text(file, "r", encoding="utf-8") as f:
+            yield from iter_array_items(f, key)
+
+    try:
+        return PreviousBackup(stream("playlists"), stream("albums"))
+    except FileNotFoundError:
+        return None
+    except (UnicodeDecodeError, ValueError, EOFError, OSError):
+        print(f"Cannot read previous backup {file} (not JSON), doing a full backup")
+        return None
+
+
+def _write_text_playlist(f, playlist):
+    f.write(playlist["name"] + "\r\n")
+    for track in playlist["tracks"]:
+        if track["track"]:
+            f.write(
+                "{name}\t{artists}\t{album}\t{uri}\t{release_date}\r\n".format(
+                    uri=track["track"]["uri"],
+                    name=track["track"]["name"],
+                    artists=", ".join(
+                        [artist["name"] for artist in track["track"]["artists"]]
+                    ),
+                    album=track["track"]["album"]["name"],
+                    release_date=track["track"]["album"]["release_date"],
+                )
+            )
+    f.write("\r\n")
+
+
+class BackupWriter:
+    """Writes a backup in the specified format ("json", "sqlite" or "txt") to `file`.
+
+    Playlists are written out as they are added, rather than all at the end.  The
+    backup is written to a temporary file that only replaces `file` once it is
+    complete (`close()`), so an interrupted backup never leaves a truncated file.
+    A `file` ending in ".gz" or ".zst" is written compressed.
+    Used as a context manager, the backup is discarded if an exception is raised.
+    """
+
+    def __init__(self, file, format="json"):
+        self.file = file
+        self.format = format
+        self.count = 0
+        self._tmp = f"{file}.tmp"
+        self._albums = []
+        if format == "sqlite":
+            if compression_for(file):
+                raise ValueError(f"SQLite backups cannot be compressed: {file}")
+            self._db = BackupDBWriter(self._tmp)
+        else:
+            self._f = open_text(
+                self._tmp, "w", encoding="utf-8", compression=compression_for(file)
+            )
+            if format == "json":
+                self._f.write('{"playlists": [')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add_playlist(self, playlist):
+        if self.format == "sqlite":
+            self._db.add_playlist(playlist)
+        elif self.format == "json":
+            self._f.write((", " if self.count else "") + json.dumps(playlist))
+        else:
+            _write_text_playlist(self._f, playlist)
+        self.count += 1
+
+    def add_albums(self, liked_albums):
+        if self.format == "sqlite":
+            self._db.add_albums(liked_albums)
+        else:
+            #  Written after the playlists by close() (not written in "txt" format)
+            self._albums.extend(liked_albums)
+
+    def close(self):
+        """Finish the backup and move it into place."""
+        if self.format == "sqlite":
+            self._db.close()
+        else:
+            if self.format == "json":
+                self._f.write('], "albums": ')
+                json.dump(self._albums, self._f)
+                self._f.write("}")
+            self._f.close()
+        os.replace(self._tmp, self.file)
+        #  The new backup is in Spotify's order, whatever was recorded for the old one
+        clear_metadata(self.file)
+
+    def abort(self):
+        """Discard the partially written backup."""
+        if self.format == "sqlite":
+            self._db.abort()
+        else:
+            self._f.close()
+        os.remove(self._tmp)
+
+
 def write_to_file(file, format, playlists, liked_albums):
-    """Write fetched data to a file in the specified format."""
+    """Write fetched data to a file in the specified format ("json", "sqlite" or "txt")."""
     print(f"Writing to {file}...")
-    with open(file, "w", encoding="utf-8") as f:
-        if format == "json":
-            json.dump({"playlists": playlists, "albums": liked_albums}, f)
-        else:
-            for playlist in playlists:
-                f.write(playlist["name"] + "\r\n")
-                for track in playlist["tracks"]:
-                    if track["track"]:
-                        f.write(
-                            "{name}\t{artists}\t{album}\t{uri}\t{release_date}\r\n".format(
-                                uri=track["track"]["uri"],
-                                name=track["track"]["name"],
-                                artists=", ".join(
-                                    [
-                                        artist["name"]
-                                        for artist in track["track"]["artists"]
-                                    ]
-                                ),
-                                album=track["track"]["album"]["name"],
-                                release_date=track["track"]["album"]["release_date"],
-                            )
-                        )
-                f.write("\r\n")
-
-
-def main(dump="playlists,liked", format="json", file="playlists.json", token=""):
+    with BackupWriter(file, format) as writer:
+        for playlist in playlists:
+            writer.add_playlist(playlist)
+        writer.add_albums(liked_albums)
+
+
+def main(
+    dump="playlists,liked",
+    format="json",
+    file="playlists.json",
+    token="",
+    incremental=False,
+    workers=DEFAULT_WORKERS,
+    profile="full",
+):
+    """Back up Spotify playlists and liked songs/albums to `file`.
+
+    With `incremental`, the existing JSON backup in `file` is updated rather than
+    everything being downloaded again.  Up to `workers` pages are fetched at once.
+    The `profile` ("full" or "slim", see `BACKUP_PROFILES`) selects how much of each
+    track is kept: "slim" keeps only what is needed to copy the playlists.
+    """
+    if profile not in BACKUP_PROFILES:
+        sys.exit(
+            f"Unknown backup profile {profile!r}, use one of {list(BACKUP_PROFILES)}"
+        )
     print("Starting backup...")
+    previous = load_previous_backup(file) if incremental else None
     spotify = (
-        SpotifyAPI(token)
+        SpotifyAPI(token, workers)
         if token
         else SpotifyAPI.authorize(
             client_id="5c098bcc800e45d49e476265bc9b6934",
             scope="playlist-read-private playlist-read-collaborative user-library-read",
+            workers=workers,
         )
     )
 
-    playlists, liked_albums = fetch_user_data(spotify, dump)
-    write_to_file(file, format, playlists, liked_albums)
+    print(f"Writing to {file}...")
+    try:
+        with BackupWriter(file, format) as writer:
+            fetch_user_data(
+                spotify, dump, previous, BACKUP_PROFILES[profile], writer=writer
+            )
+    except SpotifyAPIError as err:
+        print(f"Spotify requests:\n{spotify.stats.report()}")
+        sys.exit(f"Failed to fetch data from Spotify API: {err}")
+    finally:
+        if previous is not None:
+            previous.close()
+    print(f"Spotify requests:\n{spotify.stats.report()}")
+    print(f"Spotify transport: {spotify.transport.stats()}")
     print(f"Backup completed! Data written to {file}")
 
 
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+import json
+import re
+from typing import Any, Iterator, TextIO
+
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+_decoder = json.JSONDecoder()
+_NUMBER_START = frozenset("-0123456789")
+_NUMBER_END = re.compile(r"[^-+.eE0-9]")
+
+
+class _Reader:
+    """Incremental JSON reader over a text file.
+
+    Only the part of the file that is currently being decoded is held in memory:
+    values are decoded one at a time with `JSONDecoder.raw_decode`, reading more of
+    the file whenever a value runs past the end of the buffer.
+    """
+
+    def __init__(self, f: TextIO, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        """Read more of the file, returns False at end of file."""
+        if self.eof:
+            return False
+        #  Grow geometrically, so a large value is re-scanned only a few times
+        data = self.f.read(max(self.chunk_size, len(self.buf) - self.pos))
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos :] + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character ("" at end of file)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos : self.pos + 1]
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(
+                f"Malformed JSON: expected {char!r} but found {found or 'end of file'!r}"
+            )
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value."""
+        if self.peek() in _NUMBER_START:
+            #  A number is valid JSON at any point, make sure we have all of it
+            while not _NUMBER_END.search(self.buf, self.pos) and self._fill():
+                pass
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            self.pos = end
+            return value
+
+
+def _iter_array(reader: _Reader) -> Iterator[Any]:
+    reader.expect("[")
+    if reader.peek() != "]":
+        while True:
+            yield reader.value()
+            if reader.peek() != ",":
+                break
+            reader.expect(",")
+    reader.expect("]")
+
+
+def iter_array_items(
+    f: TextIO, key: str, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[Any]:
+    """Iterate over the items of the array `key` of the top-level JSON object in `f`.
+
+    Items are decoded one at a time, so memory use is bounded by the largest item
+    rather than the size of the file.  Other arrays are skipped the same way, other
+    values are decoded and dropped.  Nothing is yielded if the object has no `key`,
+    and the rest of the file is not read once the `key` array has been iterated.
+    """
+    reader = _Reader(f, chunk_size)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+
+    while True:
+        name = reader.value()
+        reader.expect(":")
+        if reader.peek() == "[":
+            if name == key:
+                yield from _iter_array(reader)
+                return
+            else:
+                for _ in _iter_array(reader):
+                    pass
+        else:
+            reader.value()
+
+        if reader.peek() != ",":
+            break
+        reader.expect(",")
+    reader.expect("}")
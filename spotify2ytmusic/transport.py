@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+import codecs
+import gzip
+import http.client
+import io
+import json
+import threading
+import urllib.error
+import urllib.parse
+from typing import Any, Dict, List, Optional, Tuple
+
+
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_MAX_IDLE = 8
+
+
+class _CountingReader:
+    """File-like wrapper that counts the bytes read through it."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.count = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.raw.read(size)
+        self.count += len(data)
+        return data
+
+
+class HTTPTransport:
+    """Pool of persistent (keep-alive) HTTP connections for fetching JSON.
+
+    Connections are kept per (scheme, host) and re-used by later requests, so the
+    TCP and TLS setup is only paid once per connection rather than once per request.
+    Responses are requested gzip compressed, and decompressed as they are read.
+    A pool may be shared between threads, each request checks out its own connection.
+
+    An HTTP error status raises `urllib.error.HTTPError`, as `urllib.request.urlopen`
+    does, so callers can inspect the `code` and `headers` (Retry-After).
+    """
+
+    def __init__(
+        self, timeout: float = DEFAULT_TIMEOUT, max_idle: int = DEFAULT_MAX_IDLE
+    ):
+        self.timeout = timeout
+        self.max_idle = max_idle
+
+        self.requests = 0
+        self.connections = 0
+        self.reused = 0
+        self.bytes_received = 0
+        self.bytes_decoded = 0
+
+        self._idle: Dict[Tuple[str, str], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def _checkout(
+        self, key: Tuple[str, str]
+    ) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.reused += 1
+                return idle.pop(), True
+            self.connections += 1
+
+        scheme, host = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, timeout=self.timeout), False
+        return http.client.HTTPConnection(host, timeout=self.timeout), False
+
+    def _checkin(self, key: Tuple[str, str], conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    def get_json(self, url: str, headers: Optional[Dict[str, str]] = None) -> Any:
+        """GET `url` and decode the JSON response."""
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        headers = {"Accept-Encoding": "gzip", **(headers or {})}
+
+        while True:
+            conn, reused = self._checkout(key)
+            try:
+                conn.request("GET", path, headers=headers)
+                response = conn.getresponse()
+            except (ConnectionError, http.client.BadStatusLine):
+                conn.close()
+                #  The server may have closed an idle connection, retry on a new one
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            break
+
+        wire = _CountingReader(response)
+        body = wire
+        if response.getheader("Content-Encoding") == "gzip":
+            body = gzip.GzipFile(fileobj=wire, mode="rb")
+        decoded = _CountingReader(body)
+        try:
+            if response.status >= 400:
+                raise urllib.error.HTTPError(
+                    url,
+                    response.status,
+                    response.reason,
+                    response.headers,
+                    io.BytesIO(decoded.read()),
+                )
+            value = json.load(codecs.getreader("utf-8")(decoded))
+            #  Read any trailing data so the connection can be re-used
+            wire.read()
+        except BaseException:
+            conn.close()
+            raise
+        finally:
+            with self._lock:
+                self.requests += 1
+                self.bytes_received += wire.count
+                self.bytes_decoded += decoded.count
+
+        if response.will_close:
+            conn.close()
+        else:
+            self._checkin(key, conn)
+        return value
+
+    def stats(self) -> str:
+        return (
+            f"{self.requests} requests over {self.connections} connections "
+            f"({self.reused} re-used), {self.bytes_received} bytes received "
+            f"({self.bytes_decoded} bytes decoded)"
+        )
+
+
+_transport: Optional[HTTPTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> HTTPTransport:
+    """Return the connection pool shared by everything in this process."""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = HTTPTransport()
+        return _transport
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from spotify2ytmusic import backend
+from spotify2ytmusic.journal import CopyJournal
+from spotify2ytmusic.match_cache import MatchCache, make_key
+
+
+def make_yt():
+    yt = MagicMock()
+
+    def search(query, filter):
+        if filter == "albums":
+            return []
+        title = query.split(" by ")[0]
+        return [{"videoId": title, "title": title, "artists": [{"name": "A"}]}]
+
+    yt.search.side_effect = search
+    return yt
+
+
+class TestCopyJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def journal(self, resume):
+        return CopyJournal("src", "dst", resume, directory=self.tmpdir.name)
+
+    def test_resume_skips_committed_tracks(self):
+        tracks = [backend.SongInfo(str(n), "A", "B") for n in range(10)]
+
+        yt = make_yt()
+        with self.journal(resume=False) as journal:
+            backend.copier(
+                iter(tracks[:6]), "dst", yt=yt, batch_size=3, journal=journal
+            )
+
+        yt = make_yt()
+        with self.journal(resume=True) as journal:
+            backend.copier(iter(tracks), "dst", yt=yt, batch_size=3, journal=journal)
+
+        added = [c.kwargs["videoIds"] for c in yt.add_playlist_items.call_args_list]
+        self.assertEqual(sum(added, []), ["6", "7", "8", "9"])
+        song_searches = [
+            c for c in yt.search.call_args_list if c.kwargs["filter"] == "songs"
+        ]
+        self.assertEqual(len(song_searches), 4)
+
+    def test_resolved_but_uncommitted_tracks_are_not_looked_up_again(self):
+        track = backend.SongInfo("1", "A", "B")
+        with self.journal(resume=False) as journal:
+            journal.record_resolved(0, track, {"videoId": "v1", "title": "1"})
+
+        yt = make_yt()
+        with self.journal(resume=True) as journal:
+            backend.copier(iter([track]), "dst", yt=yt, journal=journal)
+
+        yt.search.assert_not_called()
+        yt.add_playlist_items.assert_called_once_with(
+            playlistId="dst", videoIds=["v1"], duplicates=False
+        )
+
+    def test_without_resume_journal_is_reset(self):
+        track = backend.SongInfo("1", "A", "B")
+        with self.journal(resume=False) as journal:
+            journal.record_committed([(0, track)])
+        with self.journal(resume=False) as journal:
+            self.assertFalse(journal.is_committed(0, track))
+        self.assertEqual(os.path.getsize(journal.filename), 0)
+
+
+class TestIncrementalCopy(unittest.TestCase):
+    def test_only_missing_tracks_are_looked_up_and_added(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = MatchCache(os.path.join(tmpdir, "match_cache.db"))
+            cache.put(make_key("1", "A", "B", 0), {"videoId": "1", "title": "1"})
+
+            yt = make_yt()
+            yt.get_playlist.return_value = {
+                "title": "Dst",
+                "tracks": [{"videoId": "1"}, {"videoId": "2"}],
+            }
+            tracks = [backend.SongInfo(str(n), "A", "B") for n in range(1, 4)]
+
+            backend.copier(
+                iter(tracks), "dst", yt=yt, match_cache=cache, incremental=True
+            )
+            cache.close()
+
+        yt.get_playlist.assert_called_once_with(playlistId="dst", limit=None)
+        searched = [
+            c.kwargs["query"]
+            for c in yt.search.call_args_list
+            if c.kwargs["filter"] == "songs"
+        ]
+        self.assertEqual(searched, ["2 by A", "3 by A"])
+        yt.add_playlist_items.assert_called_once_with(
+            playlistId="dst", videoIds=["3"], duplicates=False
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+
+import random
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+from spotify2ytmusic import backend
+from spotify2ytmusic.response_cache import CachingYTMusic
+
+
+def make_yt():
+    yt = MagicMock()
+
+    def search(query, filter):
+        if filter == "albums":
+            return [{"browseId": "album1"}]
+        return [{"videoId": "song", "title": "Other", "artists": [{"name": "Artist"}]}]
+
+    yt.search.side_effect = search
+    yt.get_album.return_value = {
+        "tracks": [
+            {"videoId": "v1", "title": "One"},
+            {"videoId": "v2", "title": "Two"},
+        ]
+    }
+    return yt
+
+
+class TestAlbumIndex(unittest.TestCase):
+    def test_grouped_copier_resolves_album_once(self):
+        yt = make_yt()
+        tracks = [
+            backend.SongInfo("One", "Artist", "Album"),
+            backend.SongInfo("Two", "Artist", "Album"),
+            backend.SongInfo("Other", "Artist", "Album"),
+        ]
+
+        backend.copier(iter(tracks), "dst", track_sleep=0, yt=yt, group_albums=True)
+
+        album_searches = [
+            c for c in yt.search.call_args_list if c.kwargs["filter"] == "albums"
+        ]
+        self.assertEqual(len(album_searches), 1)
+        self.assertEqual(yt.get_album.call_count, 1)
+        added = [c.kwargs["videoIds"] for c in yt.add_playlist_items.call_args_list]
+        self.assertEqual(sum(added, []), ["v1", "v2", "song"])
+
+    def test_failed_album_lookup_is_retried(self):
+        yt = make_yt()
+        yt.get_album.side_effect = [
+            Exception("temporary"),
+            yt.get_album.return_value,
+        ]
+        index = backend.AlbumIndex()
+
+        self.assertIsNone(index.find(yt, "One", "Artist", "Album"))
+        self.assertEqual(index.find(yt, "Two", "Artist", "Album")["videoId"], "v2")
+        self.assertEqual(index.find(yt, "One", "Artist", "Album")["videoId"], "v1")
+        self.assertEqual(yt.get_album.call_count, 2)
+
+    def test_concurrent_finds_resolve_album_once(self):
+        yt = make_yt()
+        album = yt.get_album.return_value
+
+        def slow_get_album(browse_id):
+            time.sleep(0.05)
+            return album
+
+        yt.get_album.side_effect = slow_get_album
+        index = backend.AlbumIndex()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            found = list(
+                executor.map(
+                    lambda title: index.find(yt, title, "Artist", "Album"),
+                    ["One", "Two"] * 4,
+                )
+            )
+
+        self.assertEqual([track["videoId"] for track in found], ["v1", "v2"] * 4)
+        self.assertEqual(yt.get_album.call_count, 1)
+        self.assertEqual(index.albums_resolved, 1)
+
+    def test_ungrouped_lookup_searches_album_per_track(self):
+        yt = make_yt()
+        backend.lookup_song(yt, "One", "Artist", "Album", 0)
+        backend.lookup_song(yt, "Two", "Artist", "Album", 0)
+
+        self.assertEqual(yt.get_album.call_count, 2)
+
+
+class TestConcurrentCopier(unittest.TestCase):
+    def test_imap_ordered_keeps_source_order(self):
+        def slow_square(n):
+            time.sleep(random.random() / 100)
+            return n * n
+
+        results = list(backend.imap_ordered(slow_square, range(50), workers=8))
+        self.assertEqual(results, [(n, n * n) for n in range(50)])
+
+    def test_copier_workers_add_in_source_order(self):
+        yt = MagicMock()
+
+        def search(query, filter):
+            time.sleep(random.random() / 100)
+            if filter == "albums":
+                return []
+            title = query.split(" by ")[0]
+            return [{"videoId": title, "title": title, "artists": [{"name": "A"}]}]
+
+        yt.search.side_effect = search
+        tracks = [backend.SongInfo(str(n), "A", "B") for n in range(30)]
+
+        backend.copier(iter(tracks), "dst", track_sleep=0, yt=yt, workers=6)
+
+        added = [c.kwargs["videoIds"] for c in yt.add_playlist_items.call_args_list]
+        self.assertEqual(sum(added, []), [str(n) for n in range(30)])
+
+
+class TestPrefetch(unittest.TestCase):
+    def test_prefetch_yields_items_in_order(self):
+        self.assertEqual(
+            list(backend.prefetch(iter(range(20)), depth=3)), list(range(20))
+        )
+
+    def test_prefetch_reads_ahead_while_consumer_works(self):
+        produced = []
+
+        def pages():
+            for page in range(3):
+                produced.append(page)
+                yield page
+
+        items = backend.prefetch(pages(), depth=2)
+        self.assertEqual(next(items), 0)
+        deadline = time.monotonic() + 2
+        while len(produced) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(produced, [0, 1, 2])
+        self.assertEqual(list(items), [1, 2])
+
+    def test_prefetch_reraises_source_errors(self):
+        def pages():
+            yield 1
+            raise ValueError("page failed")
+
+        items = backend.prefetch(pages())
+        self.assertEqual(next(items), 1)
+        with self.assertRaises(ValueError):
+            next(items)
+
+
+class TestPlaylistWriter(unittest.TestCase):
+    def test_batches_and_flush_on_exit(self):
+        yt = MagicMock()
+        yt.add_playlist_items.return_value = {"status": "STATUS_SUCCEEDED"}
+
+        with backend.PlaylistWriter(yt, "dst", batch_size=4) as writer:
+            for n in range(10):
+                writer.add(str(n))
+
+        batches = [c.kwargs["videoIds"] for c in yt.add_playlist_items.call_args_list]
+        self.assertEqual([len(b) for b in batches], [4, 4, 2])
+        self.assertEqual(writer.added, 10)
+
+    def test_bisects_failed_batch(self):
+        yt = MagicMock()
+
+        def add_playlist_items(playlistId, videoIds, duplicates):
+            if "bad" in videoIds:
+                return {"status": "STATUS_FAILED"}
+            return {"status": "STATUS_SUCCEEDED"}
+
+        yt.add_playlist_items.side_effect = add_playlist_items
+        ids = ["a", "b", "c", "bad", "d", "e", "f", "g"]
+
+        with backend.PlaylistWriter(yt, "dst", batch_size=8) as writer:
+            for video_id in ids:
+                writer.add(video_id)
+
+        self.assertEqual(writer.added, 7)
+        added = [
+            c.kwargs["videoIds"]
+            for c in yt.add_playlist_items.call_args_list
+            if "bad" not in c.kwargs["videoIds"]
+        ]
+        self.assertEqual(sum(added, []), ["a", "b", "c", "d", "e", "f", "g"])
+
+    @patch("spotify2ytmusic.ratelimit.time.sleep")
+    def test_transient_error_retries_whole_batch(self, sleep):
+        yt = MagicMock()
+        yt.add_playlist_items.side_effect = [
+            Exception("HTTP 503: Service Unavailable"),
+            {"status": "STATUS_SUCCEEDED"},
+        ]
+
+        with backend.PlaylistWriter(yt, "dst", batch_size=4) as writer:
+            for video_id in ["a", "b", "c", "d"]:
+                writer.add(video_id)
+
+        batches = [c.kwargs["videoIds"] for c in yt.add_playlist_items.call_args_list]
+        self.assertEqual(batches, [["a", "b", "c", "d"]] * 2)
+        self.assertEqual(writer.added, 4)
+
+    def test_non_retryable_error_splits_batch(self):
+        yt = MagicMock()
+
+        def add_playlist_items(playlistId, videoIds, duplicates):
+            if "bad" in videoIds:
+                raise KeyError("contents")
+            return {"status": "STATUS_SUCCEEDED"}
+
+        yt.add_playlist_items.side_effect = add_playlist_items
+
+        with backend.PlaylistWriter(yt, "dst", batch_size=4) as writer:
+            for video_id in ["a", "bad", "c", "d"]:
+                writer.add(video_id)
+
+        self.assertEqual(writer.added, 3)
+        self.assertEqual(writer.failed, ["bad"])
+
+    def test_rejected_ids_are_not_reported_as_added(self):
+        yt = MagicMock()
+
+        def add_playlist_items(playlistId, videoIds, duplicates):
+            if "bad" in videoIds:
+                return {"status": "STATUS_FAILED"}
+            return {"status": "STATUS_SUCCEEDED"}
+
+        yt.add_playlist_items.side_effect = add_playlist_items
+        added, rejected = [], []
+
+        with backend.PlaylistWriter(
+            yt, "dst", batch_size=4, on_added=added.extend, on_rejected=rejected.extend
+        ) as writer:
+            for video_id in ["a", "bad", "c", "d"]:
+                writer.add(video_id, video_id.upper())
+
+        self.assertEqual(sorted(added), ["A", "C", "D"])
+        self.assertEqual(rejected, ["BAD"])
+        self.assertEqual(writer.added, 3)
+        self.assertEqual(writer.rejected, ["bad"])
+        self.assertEqual(writer.failed, [])
+
+
+class TestCachingYTMusic(unittest.TestCase):
+    def test_repeated_calls_are_cached(self):
+        yt = make_yt()
+        cached = CachingYTMusic(yt)
+
+        backend.lookup_song(cached, "One", "Artist", "Album", 0)
+        backend.lookup_song(cached, "Two", "Artist", "Album", 0)
+
+        self.assertEqual(yt.get_album.call_count, 1)
+        self.assertEqual(yt.search.call_count, 1)
+        self.assertEqual((cached.hits, cached.misses), (2, 2))
+
+    def test_bounds(self):
+        yt = MagicMock()
+        yt.search.side_effect = lambda query, filter: ["x" * 100]
+        cached = CachingYTMusic(yt, max_entries=3, max_bytes=250)
+
+        for i in range(5):
+            cached.search(query=str(i), filter="songs")
+        self.assertLessEqual(cached.size_bytes, 250)
+        self.assertEqual(len(cached._entries), 2)
+
+        cached.search(query="4", filter="songs")
+        self.assertEqual(cached.hits, 1)
+
+    def test_uncached_methods_pass_through(self):
+        yt = MagicMock()
+        cached = CachingYTMusic(yt)
+        cached.add_playlist_items(playlistId="pl", videoIds=["a"])
+        cached.add_playlist_items(playlistId="pl", videoIds=["a"])
+        self.assertEqual(yt.add_playlist_items.call_count, 2)
+
+
+class TestPlaylistIndex(unittest.TestCase):
+    def test_library_is_listed_once(self):
+        yt = MagicMock()
+        yt.get_library_playlists.return_value = [
+            {"title": "One", "playlistId": "PL1"},
+            {"title": "Two", "playlistId": "PL2"},
+        ]
+        index = backend.PlaylistIndex(yt)
+
+        self.assertEqual(index.get_id("Two"), "PL2")
+        self.assertIsNone(index.get_id("Three"))
+        index.add("Three", "PL3")
+        self.assertEqual(index.get_id("Three"), "PL3")
+        self.assertEqual([pl["title"] for pl in index], ["One", "Two", "Three"])
+        yt.get_library_playlists.assert_called_once_with(limit=5000)
+
+
+if __name__ == "__main__":
+    unittest.main()
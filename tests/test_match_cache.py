@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from spotify2ytmusic import backend
+from spotify2ytmusic.match_cache import MatchCache, make_key
+
+
+class TestMatchCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "match_cache.db")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_key_normalization(self):
+        self.assertEqual(
+            make_key("Survival ", "YES", "Yes", 0),
+            make_key("survival", "yes", " yes", 0),
+        )
+        self.assertNotEqual(
+            make_key("Survival", "Yes", "Yes", 0), make_key("Survival", "Yes", "Yes", 1)
+        )
+
+    def test_lookup_song_uses_cache(self):
+        yt = MagicMock()
+        yt.search.return_value = [
+            {"videoId": "abc", "title": "Survival", "artists": [{"name": "Yes"}]}
+        ]
+
+        with MatchCache(self.filename) as cache:
+            first = backend.lookup_song(
+                yt, "Survival", "Yes", "Yes", 0, match_cache=cache
+            )
+            calls = yt.search.call_count
+            second = backend.lookup_song(
+                yt, "survival", "Yes", "Yes", 0, match_cache=cache
+            )
+
+            self.assertEqual(first, second)
+            self.assertEqual(yt.search.call_count, calls)
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        with MatchCache(self.filename) as cache:
+            self.assertEqual(len(cache), 1)
+
+    def test_journal_mode(self):
+        with MatchCache(self.filename):
+            pass
+        with MatchCache(self.filename, journal_mode="DELETE"):
+            pass
+
+        db = sqlite3.connect(self.filename)
+        try:
+            mode = db.execute("PRAGMA journal_mode").fetchone()[0]
+        finally:
+            db.close()
+        self.assertEqual(mode, "delete")
+
+    def test_cache_errors_are_not_fatal(self):
+        yt = MagicMock()
+        yt.search.return_value = [
+            {"videoId": "abc", "title": "Survival", "artists": [{"name": "Yes"}]}
+        ]
+        cache = MagicMock()
+        cache.get.side_effect = sqlite3.OperationalError("database is locked")
+        cache.put.side_effect = sqlite3.OperationalError("database is locked")
+
+        song = backend.lookup_song(yt, "Survival", "Yes", "Yes", 0, match_cache=cache)
+        self.assertEqual(song["videoId"], "abc")
+
+    def test_expiry_and_purge(self):
+        with MatchCache(self.filename, ttl=None) as cache:
+            cache.put(make_key("A", "B", "C", 0), {"videoId": "1"})
+            cache.put(make_key("D", "E", "F", 0), {"videoId": "2"})
+
+        with MatchCache(self.filename, ttl=-1) as cache:
+            self.assertIsNone(cache.get(make_key("A", "B", "C", 0)))
+            self.assertEqual(len(cache), 0)
+
+        with MatchCache(self.filename) as cache:
+            cache.put(make_key("A", "B", "C", 0), {"videoId": "1"})
+            cache.put(make_key("D", "E", "F", 0), {"videoId": "2"})
+            self.assertEqual(cache.purge(pattern="e"), 1)
+            self.assertEqual(len(cache), 1)
+
+    def test_max_entries(self):
+        with MatchCache(self.filename, max_entries=2) as cache:
+            for i in range(5):
+                cache.put(make_key(str(i), "B", "C", 0), {"videoId": str(i)})
+            cache.evict()
+            self.assertEqual(len(cache), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+import unittest
+from unittest.mock import patch
+
+from spotify2ytmusic.ratelimit import RateLimiter, RateLimited
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_aimd(self):
+        limiter = RateLimiter("test", rate=4.0, increase=1.0, decrease=0.5, max_rate=6)
+        limiter.success()
+        self.assertEqual(limiter.rate, 5.0)
+        limiter.failure()
+        self.assertEqual(limiter.rate, 2.5)
+        for _ in range(10):
+            limiter.success()
+        self.assertEqual(limiter.rate, 6)
+
+    @patch("spotify2ytmusic.ratelimit.time.sleep")
+    def test_retry_backs_off_and_gives_up(self, sleep):
+        limiter = RateLimiter("test", max_backoff=4)
+        calls = []
+
+        def fail():
+            calls.append(1)
+            raise RuntimeError("Server returned HTTP 500")
+
+        with self.assertRaises(RuntimeError):
+            limiter.retry(fail, "test", tries=5)
+        self.assertEqual(len(calls), 5)
+        delays = [c.args[0] for c in sleep.call_args_list]
+        self.assertEqual(len(delays), 4)
+        self.assertTrue(all(0 < d <= 4 for d in delays))
+
+    @patch("spotify2ytmusic.ratelimit.time.sleep")
+    def test_retry_does_not_retry_parse_errors(self, sleep):
+        limiter = RateLimiter("test")
+        calls = []
+
+        def fail():
+            calls.append(1)
+            raise KeyError("tracks")
+
+        with self.assertRaises(KeyError):
+            limiter.retry(fail, "test")
+        self.assertEqual(len(calls), 1)
+
+    def test_rate_limited_proxy_reports_throttling(self):
+        class Client:
+            def search(self):
+                raise RuntimeError("Server returned HTTP 429: Too Many Requests")
+
+        limiter = RateLimiter("test", rate=10.0)
+        with self.assertRaises(RuntimeError):
+            RateLimited(Client(), limiter).search()
+        self.assertEqual(limiter.throttled, 1)
+        self.assertEqual(limiter.rate, 5.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
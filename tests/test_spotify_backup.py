@@ -0,0 +1,529 @@
+#!/usr/bin/env python
+
+import importlib.util
+import io
+import json
+import os
+import tempfile
+import time
+import urllib.parse
+import unittest
+from unittest.mock import patch
+
+from spotify2ytmusic import backend, spotify_backup
+from spotify2ytmusic.backup_db import BackupDB, write_backup_db
+from spotify2ytmusic.reverse_playlist import reverse_playlist
+from spotify2ytmusic.stream_json import iter_array_items
+
+TEST_FILE = "tests/playliststest.json"
+TEST_PLAYLIST = "68QlHDwCiXfhodLpS72iOx"
+
+
+class TestSpotifyBackup(unittest.TestCase):
+    def test_iterators_share_one_parse(self):
+        backup = backend.SpotifyBackup.load(TEST_FILE)
+        with patch.object(backend, "load_playlists_json") as load:
+            songs = list(backend.iter_spotify_playlist(TEST_PLAYLIST, backup=backup))
+            albums = list(backend.iter_spotify_liked_albums(backup=backup))
+        load.assert_not_called()
+
+        self.assertEqual(len(songs), 38)
+        self.assertEqual(albums, [])
+        self.assertEqual(
+            songs,
+            list(
+                backend.iter_spotify_playlist(
+                    TEST_PLAYLIST, spotify_playlist_file=TEST_FILE
+                )
+            ),
+        )
+
+    def test_find_playlist(self):
+        backup = backend.SpotifyBackup(
+            {
+                "playlists": [
+                    {"id": "a", "name": "First", "tracks": []},
+                    {"id": None, "name": "Liked Songs", "tracks": []},
+                ]
+            }
+        )
+        self.assertEqual(backup.find_playlist("a")["name"], "First")
+        self.assertEqual(backup.find_playlist(None)["name"], "Liked Songs")
+        with self.assertRaises(ValueError):
+            backup.find_playlist("missing")
+
+
+class TestStreamJSON(unittest.TestCase):
+    def test_items_match_json_load(self):
+        with open(TEST_FILE, encoding="utf-8") as f:
+            expected = json.load(f)["playlists"]
+        #  A tiny chunk size forces values to be split across reads
+        with open(TEST_FILE, encoding="utf-8") as f:
+            self.assertEqual(
+                list(iter_array_items(f, "playlists", chunk_size=7)), expected
+            )
+
+    def test_other_keys_are_skipped(self):
+        doc = '{ "n": 12345, "playlists": [{"a": [1, 2]}], "albums" : [ 1 , 2.5 ,{"x":"]"}] }'
+        for chunk_size in (1, 3, 1000):
+            self.assertEqual(
+                list(iter_array_items(io.StringIO(doc), "albums", chunk_size)),
+                [1, 2.5, {"x": "]"}],
+            )
+        self.assertEqual(list(iter_array_items(io.StringIO(doc), "missing")), [])
+        self.assertEqual(list(iter_array_items(io.StringIO("{}"), "albums")), [])
+
+    def test_malformed(self):
+        with self.assertRaises(ValueError):
+            list(iter_array_items(io.StringIO('{"albums": [1 2]}'), "albums"))
+
+    def test_iter_spotify_playlist_streams(self):
+        with patch.object(backend, "load_playlists_json") as load:
+            songs = list(
+                backend.iter_spotify_playlist(
+                    TEST_PLAYLIST, spotify_playlist_file=TEST_FILE
+                )
+            )
+        load.assert_not_called()
+        self.assertEqual(len(songs), 38)
+        with self.assertRaises(ValueError):
+            list(
+                backend.iter_spotify_playlist(
+                    "missing", spotify_playlist_file=TEST_FILE
+                )
+            )
+
+    def test_playlist_name_streams(self):
+        backup = backend.SpotifyBackup.load(TEST_FILE)
+        with patch.object(backend, "load_playlists_json") as load:
+            name = backend._spotify_playlist_name(TEST_PLAYLIST, filename=TEST_FILE)
+        load.assert_not_called()
+        self.assertEqual(name, backup.find_playlist(TEST_PLAYLIST)["name"])
+
+
+class TestBackupDB(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "playlists.json")
+        with open(TEST_FILE, encoding="utf-8") as f:
+            self.data = json.load(f)
+        self.data["playlists"].append(
+            {"name": "Liked Songs", "tracks": [{"track": None}]}
+        )
+        self.data["albums"] = [
+            {
+                "added_at": "2024-01-01T00:00:00Z",
+                "album": {
+                    "id": "al1",
+                    "name": "Album",
+                    "artists": [{"name": "Band"}],
+                    "tracks": {
+                        "items": [
+                            {"name": "One", "artists": [{"name": "Band"}]},
+                            {"name": "Two", "artists": [{"name": "Other"}]},
+                        ]
+                    },
+                },
+            }
+        ]
+        write_backup_db(self.filename, self.data["playlists"], self.data["albums"])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_same_songs_as_json(self):
+        backup = backend.SpotifyBackup(self.data)
+        for reverse in (True, False):
+            self.assertEqual(
+                list(
+                    backend.iter_spotify_playlist(
+                        TEST_PLAYLIST,
+                        spotify_playlist_file=self.filename,
+                        reverse_playlist=reverse,
+                    )
+                ),
+                list(
+                    backend.iter_spotify_playlist(
+                        TEST_PLAYLIST, reverse_playlist=reverse, backup=backup
+                    )
+                ),
+            )
+        self.assertEqual(
+            list(backend.iter_spotify_liked_albums(self.filename)),
+            list(backend.iter_spotify_liked_albums(backup=backup)),
+        )
+        self.assertEqual(list(backend.iter_spotify_playlist(None, self.filename)), [])
+
+    def test_load_detects_format(self):
+        backup = backend.load_spotify_backup(self.filename)
+        self.assertIsInstance(backup, BackupDB)
+        self.assertEqual(
+            [(pl.get("id"), backup.track_count(pl)) for pl in backup.playlists],
+            [(TEST_PLAYLIST, 38), (None, 1)],
+        )
+        with self.assertRaises(ValueError):
+            backup.find_playlist("missing")
+        backup.close()
+        self.assertIsInstance(
+            backend.load_spotify_backup(TEST_FILE), backend.SpotifyBackup
+        )
+
+
+class FakeSpotify:
+    """Serves saved items newest first, in pages of 2, recording the URLs fetched."""
+
+    workers = 1
+
+    def __init__(self, saved, playlists):
+        self.saved = saved
+        self.playlists = playlists
+        self.fetched = []
+
+    def get(self, url, params={}):
+        self.fetched.append(url)
+        offset = int(url.split("#")[1]) if "#" in url else 0
+        items = self.saved[url.split("#")[0]]
+        return {
+            "items": items[offset : offset + 2],
+            "total": len(items),
+            "next": (
+                f"{url.split('#')[0]}#{offset + 2}" if offset + 2 < len(items) else None
+            ),
+        }
+
+    def list(self, url, params={}):
+        self.fetched.append(url)
+        if url == "me/playlists":
+            return [dict(pl) for pl in self.playlists]
+        return list(self.saved.get(url, []))
+
+
+def saved(*dates):
+    return [{"added_at": date, "track": {"name": date}} for date in dates]
+
+
+class TestIncrementalBackup(unittest.TestCase):
+    def test_only_changes_are_fetched(self):
+        playlists = [
+            {
+                "id": "p1",
+                "name": "Same",
+                "snapshot_id": "s1",
+                "tracks": {"href": "p1/tracks"},
+            },
+            {
+                "id": "p2",
+                "name": "Changed",
+                "snapshot_id": "s3",
+                "tracks": {"href": "p2/tracks"},
+            },
+        ]
+        previous = spotify_backup.PreviousBackup(
+            [
+                {"name": "Liked Songs", "tracks": saved("03", "02", "01")},
+                {"id": "p1", "name": "Same", "snapshot_id": "s1", "tracks": saved("a")},
+                {
+                    "id": "p2",
+                    "name": "Changed",
+                    "snapshot_id": "s2",
+                    "tracks": saved("b"),
+                },
+            ],
+            [],
+        )
+        spotify = FakeSpotify(
+            {
+                "me/tracks": saved("06", "05", "04", "03", "02", "01"),
+                "me/albums": [],
+                "p2/tracks": saved("b", "c"),
+            },
+            playlists,
+        )
+
+        pls, albums = spotify_backup.fetch_user_data(
+            spotify, "liked,playlists", previous
+        )
+
+        self.assertEqual(
+            [item["added_at"] for item in pls[0]["tracks"]],
+            ["06", "05", "04", "03", "02", "01"],
+        )
+        self.assertEqual(pls[1]["tracks"], saved("a"))
+        self.assertEqual(pls[2]["tracks"], saved("b", "c"))
+        self.assertEqual(
+            spotify.fetched,
+            ["me/tracks", "me/tracks#2", "me/albums", "me/playlists", "p2/tracks"],
+        )
+
+    def test_removed_items_cause_a_full_reload(self):
+        spotify = FakeSpotify({"me/tracks": saved("04", "01")}, [])
+        items = spotify_backup.list_new_items(
+            spotify, "me/tracks", {}, saved("03", "02", "01")
+        )
+        self.assertEqual(items, saved("04", "01"))
+
+
+class TestSlimProfile(unittest.TestCase):
+    def test_parse_fields(self):
+        self.assertEqual(
+            spotify_backup.parse_fields("a,b(c,d(e)),f"),
+            {"a": None, "b": {"c": None, "d": {"e": None}}, "f": None},
+        )
+        with self.assertRaises(ValueError):
+            spotify_backup.parse_fields("a(b")
+
+    def test_slim_backup_keeps_what_the_backend_reads(self):
+        track = {
+            "added_at": "01",
+            "is_local": False,
+            "track": {
+                "name": "Song",
+                "uri": "spotify:track:1",
+                "available_markets": ["US"] * 100,
+                "artists": [{"name": "Band", "href": "x"}, {"name": "Guest"}],
+                "album": {"name": "Album", "images": [{"url": "y"}]},
+            },
+        }
+        spotify = FakeSpotify(
+            {"me/tracks": [track, {"added_at": "00", "track": None}], "me/albums": []},
+            [],
+        )
+        pls, _ = spotify_backup.fetch_user_data(
+            spotify, "liked", fields=spotify_backup.SLIM_FIELDS
+        )
+        self.assertEqual(
+            pls[0]["tracks"],
+            [
+                {
+                    "added_at": "01",
+                    "track": {
+                        "name": "Song",
+                        "uri": "spotify:track:1",
+                        "artists": [{"name": "Band"}, {"name": "Guest"}],
+                        "album": {"name": "Album"},
+                    },
+                },
+                {"added_at": "00", "track": None},
+            ],
+        )
+        backup = backend.SpotifyBackup({"playlists": pls})
+        self.assertEqual(
+            list(backend.iter_spotify_playlist(None, backup=backup)),
+            [backend.SongInfo("Song", "Band", "Album")],
+        )
+
+
+class TestBackupWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "playlists.json")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_streamed_backup_matches_write_to_file(self):
+        spotify = FakeSpotify(
+            {"me/tracks": saved("02", "01"), "me/albums": [], "p1/tracks": saved("a")},
+            [{"id": "p1", "name": "One", "tracks": {"href": "p1/tracks"}}],
+        )
+        with spotify_backup.BackupWriter(self.filename) as writer:
+            self.assertEqual(
+                spotify_backup.fetch_user_data(
+                    spotify, "liked,playlists", writer=writer
+                ),
+                ([], []),
+            )
+        self.assertEqual(writer.count, 2)
+        with open(self.filename, encoding="utf-8") as f:
+            streamed = json.load(f)
+
+        playlists, albums = spotify_backup.fetch_user_data(spotify, "liked,playlists")
+        spotify_backup.write_to_file(self.filename, "json", playlists, albums)
+        with open(self.filename, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), streamed)
+        self.assertEqual(streamed["playlists"][1]["tracks"], saved("a"))
+
+    def test_failed_backup_keeps_the_previous_file(self):
+        with open(self.filename, "w") as f:
+            f.write("previous")
+        for format in ("json", "sqlite", "txt"):
+            with self.assertRaises(RuntimeError):
+                with spotify_backup.BackupWriter(self.filename, format) as writer:
+                    writer.add_playlist({"name": "One", "tracks": []})
+                    raise RuntimeError("interrupted")
+            with open(self.filename) as f:
+                self.assertEqual(f.read(), "previous")
+        self.assertEqual(os.listdir(self.tmpdir.name), ["playlists.json"])
+
+
+class TestCompressedBackups(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        with open(TEST_FILE, encoding="utf-8") as f:
+            self.data = json.load(f)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def check_round_trip(self, suffix):
+        filename = os.path.join(self.tmpdir.name, "playlists.json" + suffix)
+        spotify_backup.write_to_file(filename, "json", self.data["playlists"], [])
+        with open(filename, "rb") as f:
+            self.assertNotEqual(f.read(1), b"{")
+
+        #  Detected from the contents, not the name
+        renamed = os.path.join(self.tmpdir.name, "renamed.json")
+        os.rename(filename, renamed)
+        self.assertEqual(backend.load_playlists_json(renamed)["albums"], [])
+        self.assertEqual(
+            len(
+                list(
+                    backend.iter_spotify_playlist(
+                        TEST_PLAYLIST, spotify_playlist_file=renamed
+                    )
+                )
+            ),
+            38,
+        )
+        with spotify_backup.load_previous_backup(renamed) as previous:
+            for playlist in self.data["playlists"]:
+                if playlist.get("snapshot_id"):
+                    self.assertEqual(
+                        previous.tracks(playlist["id"], playlist["snapshot_id"]),
+                        playlist["tracks"],
+                    )
+            self.assertIsNone(previous.tracks(TEST_PLAYLIST, "other snapshot"))
+
+    def test_gzip(self):
+        self.check_round_trip(".gz")
+
+    @unittest.skipUnless(importlib.util.find_spec("zstandard"), "needs zstandard")
+    def test_zstd(self):
+        self.check_round_trip(".zst")
+
+
+class TestReversal(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "playlists.json")
+        with open(TEST_FILE, encoding="utf-8") as f:
+            self.data = json.load(f)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def songs(self, **kwargs):
+        return list(
+            backend.iter_spotify_playlist(
+                TEST_PLAYLIST, spotify_playlist_file=self.filename, **kwargs
+            )
+        )
+
+    def test_reversal_is_a_flag(self):
+        for format in ("json", "sqlite"):
+            spotify_backup.write_to_file(
+                self.filename, format, self.data["playlists"], []
+            )
+            with open(self.filename, "rb") as f:
+                contents = f.read()
+            original = self.songs()
+
+            self.assertEqual(reverse_playlist(self.filename, verbose=False), 0)
+            with open(self.filename, "rb") as f:
+                self.assertEqual(f.read(), contents)
+            self.assertEqual(self.songs(), original[::-1])
+            self.assertEqual(self.songs(reverse_playlist=False), original)
+            backup = backend.load_spotify_backup(self.filename)
+            self.assertEqual(
+                list(backend.iter_spotify_playlist(TEST_PLAYLIST, backup=backup)),
+                original[::-1],
+            )
+
+            reverse_playlist(self.filename, verbose=False)
+            self.assertEqual(self.songs(), original)
+
+            #  A new backup replaces the flag
+            reverse_playlist(self.filename, verbose=False)
+            spotify_backup.write_to_file(
+                self.filename, format, self.data["playlists"], []
+            )
+            self.assertEqual(self.songs(), original)
+
+
+class PagedSpotifyAPI(spotify_backup.SpotifyAPI):
+    """Serves 95 numbered items in offset pages, with a slow first few pages."""
+
+    def get(self, url, params={}, tries=3):
+        if "?" in url:
+            params = dict(urllib.parse.parse_qsl(url.split("?")[1]))
+        offset, limit = int(params.get("offset", 0)), int(params["limit"])
+        if offset < 30:
+            time.sleep(0.01)
+        return {
+            "items": list(range(offset, min(offset + limit, 95))),
+            "offset": offset,
+            "limit": limit,
+            "total": 95,
+            "next": (
+                f"me/tracks?offset={offset + limit}&limit={limit}"
+                if offset + limit < 95
+                else None
+            ),
+        }
+
+
+class TestSpotifyAPIList(unittest.TestCase):
+    def test_parallel_pages_are_in_order(self):
+        for workers in (1, 4):
+            spotify = PagedSpotifyAPI("token", workers)
+            self.assertEqual(spotify.list("me/tracks", {"limit": 10}), list(range(95)))
+
+
+class FakeTransport:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.urls = []
+
+    def get_json(self, url, headers):
+        self.urls.append(url)
+        response = self.responses.pop(0)
+        if isinstance(response, int):
+            raise urllib.error.HTTPError(url, response, "error", {}, None)
+        return response
+
+
+class TestSpotifyAPIGet(unittest.TestCase):
+    def test_client_errors_fail_fast(self):
+        transport = FakeTransport(404)
+        spotify = spotify_backup.SpotifyAPI("token", transport=transport)
+        with self.assertRaises(spotify_backup.SpotifyAPIError) as cm:
+            spotify.get("playlists/37i9dQZF1DXcBWIGoYBM5M/tracks")
+        self.assertEqual(cm.exception.status, 404)
+        self.assertEqual(len(transport.urls), 1)
+
+    @patch("spotify2ytmusic.ratelimit.time.sleep")
+    def test_server_errors_are_retried(self, sleep):
+        transport = FakeTransport(503, 500, {"ok": True}, 502, 502)
+        spotify = spotify_backup.SpotifyAPI("token", transport=transport)
+        self.assertEqual(spotify.get("me/tracks"), {"ok": True})
+        with self.assertRaises(spotify_backup.SpotifyAPIError) as cm:
+            spotify.get("me/tracks", tries=2)
+        self.assertEqual(cm.exception.status, 502)
+        self.assertEqual(
+            spotify.stats.endpoints["me/tracks"]["requests"],
+            2,
+        )
+        self.assertEqual(spotify.stats.endpoints["me/tracks"]["retries"], 3)
+        self.assertEqual(spotify.stats.endpoints["me/tracks"]["failures"], 1)
+
+    def test_endpoint_names(self):
+        self.assertEqual(
+            spotify_backup.EndpointStats.endpoint(
+                "https://api.spotify.com/v1/playlists/37i9dQZF1DXcBWIGoYBM5M/tracks?limit=1"
+            ),
+            "playlists/{id}/tracks",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+import gzip
+import http.server
+import json
+import threading
+import unittest
+import urllib.error
+
+from spotify2ytmusic.transport import HTTPTransport
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/missing":
+            body, status = b'{"error": "not found"}', 404
+        else:
+            body, status = json.dumps({"path": self.path, "pad": "x" * 1000}), 200
+            body = body.encode()
+        self.send_response(status)
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestHTTPTransport(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_reused_and_gzip_decoded(self):
+        transport = HTTPTransport()
+        for i in range(3):
+            self.assertEqual(
+                transport.get_json(f"{self.base}/v1/{i}?a=b")["path"], f"/v1/{i}?a=b"
+            )
+        self.assertEqual(transport.requests, 3)
+        self.assertEqual(transport.connections, 1)
+        self.assertEqual(transport.reused, 2)
+        self.assertLess(transport.bytes_received, transport.bytes_decoded)
+        transport.close()
+
+    def test_error_status(self):
+        transport = HTTPTransport()
+        with self.assertRaises(urllib.error.HTTPError) as cm:
+            transport.get_json(f"{self.base}/missing")
+        self.assertEqual(cm.exception.code, 404)
+        self.assertEqual(transport.get_json(f"{self.base}/ok")["path"], "/ok")
+        transport.close()
+
+
+if __name__ == "__main__":
+    unittest.main()